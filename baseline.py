@@ -1,34 +1,180 @@
+import os
+import time
 import argparse
+import numpy as np
 import pandas as pd
+from src import tracing
+from src.crop_store import crop_store_path, parse_crop_filename
 from src.data_processing import batch_extract_true_labels
-from src.ocr_utils import perform_ocr, extract_original_filename
+from src.evaluation import attach_boxes, evaluate
+from src.ocr_cache import OCRCache
+from src.ocr_engines import PLATE_PATTERN, recognize_batch, register_cascade
+from src.ocr_utils import perform_ocr
+from src.ocr_worker import WORKER_SOCKET, request_ocr, worker_available
+from src.splits import load_split_manifest, split_members
 
-def main(split, engine):
-    # Perform OCR on the specified split with the given OCR engine
-    print(f"Performing OCR for split='{split}' using engine='{engine}'...")
-    pred_labels = perform_ocr(split=split, processed=True, engine=engine)
-    
-    # Load true labels
+def compute_accuracy(pred_labels, true_labels):
+    """
+    Fraction of true plates read exactly, with crops matched one to one to true plates.
+    """
+    return evaluate(pred_labels, true_labels)['metrics']['accuracy']
+
+def print_metrics(metrics):
+    print(f"Plates: {metrics['n_true']} true, {metrics['n_pred']} predicted, {metrics['n_matched']} matched")
+    print(f"OCR Accuracy: {metrics['accuracy']:.2%}")
+    print(f"OCR Precision: {metrics['precision']:.2%}")
+    print(f"Character Error Rate: {metrics['cer']:.2%} (matched plates only: {metrics['matched_cer']:.2%})")
+
+def save_report(result, report_dir):
+    """
+    Save the plate matching and the character confusion matrix as CSV files.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    result['matches'].to_csv(os.path.join(report_dir, 'matches.csv'), index=False)
+    result['confusion'].to_csv(os.path.join(report_dir, 'confusion.csv'))
+    print(f"Evaluation report saved to {report_dir}")
+
+def print_cache_stats(stats):
+    lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+    hit_rate = (lookups - stats['misses']) / lookups if lookups else 0.0
+    print(f"OCR cache: {stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, "
+          f"{stats['misses']} misses ({hit_rate:.1%} hit rate)")
+
+def print_engine_share(pred_labels):
+    """
+    With the cascade engine, show how many crops each engine read.
+    """
+    shares = pred_labels['engine'].value_counts(normalize=True)
+    if len(shares) > 1:
+        print("Reads by engine: " + ", ".join(f"{engine} {share:.1%}" for engine, share in shares.items()))
+
+def in_split(labels, manifest, split, crops=False):
+    """
+    Rows of labels whose image belongs to the split of the manifest (all rows without one).
+    With crops, the filenames are crop names and their source image is looked up.
+    """
+    if manifest is None:
+        return labels
+    members = split_members(manifest, split)
+    names = labels['filename'].astype(str)
+    if crops:
+        names = names.map(lambda name: parse_crop_filename(name)[0])
+    return labels[names.map(lambda name: os.path.splitext(name)[0] in members).to_numpy()]
+
+def load_split_labels(split, manifest=None):
+    """
+    True labels of the split, restricted to its images if a split manifest is given.
+    """
     json_directory = f"data/{split}"
     print(f"Extracting true labels from '{json_directory}'...")
-    true_labels = batch_extract_true_labels(json_directory)
-    
-    # Add a column for the original filenames in predicted labels
-    pred_labels['original_filename'] = pred_labels['filename'].apply(extract_original_filename)
+    return in_split(batch_extract_true_labels(json_directory), manifest, split)
+
+def compare_engines(split, engines, batch_size=32, use_store=False, manifest=None):
+    """
+    Accuracy, character error rate and crops per second of each engine on the
+    processed crops of the split. Model loading is not timed.
+    """
+    true_labels = load_split_labels(split, manifest)
+    crop_dir = crop_store_path(split) if use_store else f"cropped_images/{split}"
+    rows = []
+    for engine in engines:
+        print(f"Loading engine='{engine}'...")
+        recognize_batch([np.full((32, 128, 3), 255, np.uint8)], engine=engine)
+        start = time.perf_counter()
+        pred_labels = perform_ocr(split=split, processed=True, engine=engine, batch_size=batch_size,
+                                  use_store=use_store)
+        crops_per_s = len(pred_labels) / (time.perf_counter() - start)
+        pred_labels = in_split(pred_labels, manifest, split, crops=True)
+        metrics = evaluate(attach_boxes(pred_labels, crop_dir), true_labels)['metrics']
+        rows.append({'engine': engine, 'accuracy': metrics['accuracy'], 'precision': metrics['precision'],
+                     'cer': metrics['cer'], 'crops_per_s': crops_per_s})
+
+    results = pd.DataFrame(rows).set_index('engine')
+    print(f"OCR engines on split='{split}':")
+    print(results.to_string(float_format=lambda v: f"{v:.3f}"))
+    return results
+
+def main(split, engine, batch_size=32, use_store=False, trace=None, report_dir=None,
+         cache_path=None, cache_max_mb=64, splits_path=None, worker=None, min_confidence=0.9,
+         plate_pattern=PLATE_PATTERN, compare=None):
+    # With a split manifest, only the true labels of the split's images are scored
+    manifest = None if splits_path is None else load_split_manifest(splits_path)
+
+    if compare:
+        compare_engines(split, compare, batch_size, use_store, manifest)
+        return
+
+    # Perform OCR on the specified split with the given OCR engine
+    print(f"Performing OCR for split='{split}' using engine='{engine}'...")
+    if worker is not None and worker_available(worker):
+        # The worker already has the engine loaded
+        print(f"Attached to OCR worker on {worker}")
+        pred_labels, cache_stats = request_ocr(worker, split=split, processed=True, engine=engine,
+                                               batch_size=batch_size, use_store=use_store, cache_path=cache_path,
+                                               cache_max_mb=cache_max_mb, min_confidence=min_confidence,
+                                               plate_pattern=plate_pattern)
+        if cache_stats is not None:
+            print_cache_stats(cache_stats)
+    else:
+        if worker is not None:
+            print(f"No OCR worker on {worker}, running OCR in this process")
+        cache = OCRCache(cache_path, max_bytes=cache_max_mb * 1024 * 1024) if cache_path else None
+        pred_labels = perform_ocr(split=split, processed=True, engine=engine, batch_size=batch_size,
+                                  use_store=use_store, cache=cache)
+        if cache is not None:
+            print_cache_stats(cache.stats())
+            cache.close()
+    pred_labels = in_split(pred_labels, manifest, split, crops=True)
+    print_engine_share(pred_labels)
     
-    # Merge predicted labels with true labels based on the original filename
-    merged_df = pd.merge(pred_labels, true_labels, left_on='original_filename', right_on='filename', how='inner')
+    true_labels = load_split_labels(split, manifest)
     
-    # Compute OCR accuracy
-    merged_df['correct'] = merged_df['ocr_text'] == merged_df['true_lp_text']
-    accuracy = merged_df['correct'].sum() / pred_labels.shape[0]
+    # Crops are matched to true plates by box IoU when the detector boxes are available
+    crop_dir = crop_store_path(split) if use_store else f"cropped_images/{split}"
+    pred_labels = attach_boxes(pred_labels, crop_dir)
+    with tracing.span('evaluate'):
+        result = evaluate(pred_labels, true_labels)
     
-    print(f"OCR Accuracy: {accuracy:.2%}")
+    print_metrics(result['metrics'])
+    if report_dir is not None:
+        save_report(result, report_dir)
+
+    if trace is not None:
+        tracing.export(trace)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Perform OCR and calculate accuracy.")
     parser.add_argument("--split", type=str, required=True, help="Dataset split (e.g., 'val', 'test').")
-    parser.add_argument("--engine", type=str, required=True, help="OCR engine to use (e.g., 'easyocr').")
+    parser.add_argument("--engine", type=str, default=None, help="OCR engine to use (e.g., 'easyocr').")
+    parser.add_argument("--compare", type=str, nargs="+", default=None,
+                        help="Compare the accuracy and throughput of these engines instead "
+                             "(e.g., 'easyocr fast_plate_ocr yolo_ocr').")
+    parser.add_argument("--batch-size", type=int, default=32, help="Number of crops sent to the OCR engine at once.")
+    parser.add_argument("--store", action="store_true", help="Read processed crops from the memory-mapped crop store.")
+    parser.add_argument("--min-confidence", type=float, default=0.9,
+                        help="With --engine cascade, re-read crops below this fast_plate_ocr confidence with EasyOCR.")
+    parser.add_argument("--plate-pattern", type=str, default=PLATE_PATTERN,
+                        help="With --engine cascade, re-read crops whose text does not match this regex.")
+    parser.add_argument("--cache", type=str, default=None,
+                        help="SQLite file caching OCR results by crop content (e.g. .cache/ocr.sqlite).")
+    parser.add_argument("--cache-max-mb", type=int, default=64, help="Size limit of the OCR cache file.")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Record per-stage timings and save them as JSON (plus Prometheus .prom) to this path.")
+    parser.add_argument("--report", type=str, default=None,
+                        help="Directory to save the plate matching and character confusion matrix to.")
+    parser.add_argument("--worker", type=str, nargs="?", const=WORKER_SOCKET, default=None,
+                        help="Run OCR in the worker started by ocr_worker.py on this socket, if it is running "
+                             f"(default socket: {WORKER_SOCKET}).")
+    parser.add_argument("--splits", type=str, default=None,
+                        help="Split manifest (e.g. splits.json) defining which images belong to the split.")
     
     args = parser.parse_args()
-    main(split=args.split, engine=args.engine)
+    if args.engine is None and args.compare is None:
+        parser.error("one of --engine or --compare is required")
+    if args.trace:
+        tracing.enable()
+    register_cascade(min_confidence=args.min_confidence, pattern=args.plate_pattern)
+    main(split=args.split, engine=args.engine, batch_size=args.batch_size, use_store=args.store,
+         trace=args.trace, report_dir=args.report, cache_path=args.cache, cache_max_mb=args.cache_max_mb,
+         splits_path=args.splits, worker=args.worker, min_confidence=args.min_confidence,
+         plate_pattern=args.plate_pattern, compare=args.compare)
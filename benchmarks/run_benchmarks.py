@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+from queue import Empty
+import numpy as np
+
+# Stages always run in this order: predict_boxes detects the LP images written by
+# labels2yolo, while the later stages use the ground-truth crops of prepare_workdir
+STAGES = ['labels2yolo', 'predict_boxes', 'process_images', 'perform_ocr', 'merge']
+
+def _reset_peak_rss():
+    """
+    Reset the peak RSS of this process to its current RSS, where the OS allows it.
+    A spawned child inherits the parent's ru_maxrss on Linux, so without a reset
+    every stage would report at least the parent's peak.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb():
+    try:
+        # VmHWM follows the reset of _reset_peak_rss, unlike ru_maxrss
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def _split_names(dataset_dir, split):
+    with open(os.path.join(dataset_dir, f'{split}.txt')) as f:
+        return [os.path.splitext(os.path.basename(line.strip()))[0] for line in f if line.strip()]
+
+def stage_labels2yolo(workdir, **_):
+    from scripts.labels2yolo import process_image
+
+    dataset_dir = os.path.join(workdir, 'datasets', 'data')
+    lp_directory = os.path.join(workdir, 'datasets', 'data-yolo', 'LP')
+    ocr_directory = os.path.join(workdir, 'datasets', 'data-yolo', 'OCR')
+    latencies = []
+    for split in ['train', 'test']:
+        for dataset in [lp_directory, ocr_directory]:
+            os.makedirs(os.path.join(dataset, 'images', split), exist_ok=True)
+            os.makedirs(os.path.join(dataset, 'labels', split), exist_ok=True)
+        for filename in _split_names(dataset_dir, split):
+            _, seconds = _timed(process_image, filename, split, split, dataset_dir, lp_directory,
+                                ocr_directory, '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ', 320, 160)
+            latencies.append(seconds)
+    return latencies
+
+def stage_predict_boxes(workdir, weights=None, **_):
+    if weights is None:
+        return None, 'no --weights given'
+    try:
+        from ultralytics import YOLO
+    except ImportError:
+        return None, 'ultralytics is not installed'
+    from src.image_processing import IMAGE_EXTENSIONS
+    from src.model_utils import predict_boxes
+
+    image_dir = os.path.join(workdir, 'datasets', 'data-yolo', 'LP', 'images', 'test')
+    if not os.path.isdir(image_dir) or not any(f.lower().endswith(IMAGE_EXTENSIONS) for f in os.listdir(image_dir)):
+        return None, 'no LP images, run the labels2yolo stage first'
+    model = YOLO(weights)
+    # Detector crops get their own folder, so the ground-truth crops of the later stages stay untouched
+    preds, _ = _timed(predict_boxes, model, 'test', output_dir=os.path.join(workdir, 'detected_crops', 'test'))
+    # Per-image latency as reported by the detector, in seconds
+    return [sum(pred.speed.values()) / 1000 for pred in preds]
+
+def _image_files(directory):
+    from src.image_processing import IMAGE_EXTENSIONS
+
+    return [f for f in sorted(os.listdir(directory)) if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+def stage_process_images(workdir, **_):
+    from src.image_processing import _process_file
+
+    input_dir = os.path.join(workdir, 'cropped_images', 'test')
+    output_dir = os.path.join(workdir, 'cropped_images_processed', 'test')
+    os.makedirs(output_dir, exist_ok=True)
+    latencies = []
+    for filename in _image_files(input_dir):
+        _, seconds = _timed(_process_file, os.path.join(input_dir, filename),
+                            os.path.join(output_dir, filename))
+        latencies.append(seconds)
+    return latencies
+
+def stage_perform_ocr(workdir, engine=None, batch_size=32, **_):
+    if engine is None:
+        return None, 'no --engine given'
+    from src.ocr_engines import iter_batches, read_images, recognize_batch
+
+    input_dir = os.path.join(workdir, 'cropped_images_processed', 'test')
+    paths = [os.path.join(input_dir, f) for f in _image_files(input_dir)]
+    # Load the recognizer outside of the timed loop
+    recognize_batch(read_images(paths[:1])[1], engine=engine)
+    latencies = []
+    for batch in iter_batches(paths, batch_size):
+        _, seconds = _timed(lambda: recognize_batch(read_images(batch)[1], engine=engine))
+        latencies.extend([seconds / len(batch)] * len(batch))
+    return latencies
+
+def stage_merge(workdir, **_):
+    import pandas as pd
+    from baseline import compute_accuracy
+    from src.crop_store import parse_crop_filename
+    from src.data_processing import load_true_labels
+
+    true_labels = load_true_labels(os.path.join(workdir, 'data', 'test'), use_cache=False)
+    # Pretend every crop was read perfectly, so the merge sees realistic keys
+    crop_names = _image_files(os.path.join(workdir, 'cropped_images', 'test'))
+    texts = dict(zip(zip(true_labels['filename'].astype(str),
+                         true_labels.groupby('filename', observed=True).cumcount()),
+                     true_labels['true_lp_text']))
+    pred_labels = pd.DataFrame({
+        'filename': crop_names,
+        'ocr_text': [texts.get(parse_crop_filename(name), '') for name in crop_names],
+    })
+    _, seconds = _timed(compute_accuracy, pred_labels, true_labels)
+    return [seconds / max(1, len(crop_names))] * len(crop_names)
+
+def prepare_workdir(workdir, n_images, seed):
+    """
+    Build a synthetic dataset with the folder layout the pipeline expects,
+    plus ground-truth crops for the stages after detection.
+    """
+    import cv2
+    from benchmarks.synthetic import make_synthetic_dataset
+    from src.crop_store import crop_filename
+
+    dataset_dir = os.path.join(workdir, 'datasets', 'data')
+    make_synthetic_dataset(dataset_dir, n_images, seed=seed)
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    os.symlink(os.path.join(dataset_dir, 'test'), os.path.join(workdir, 'data', 'test'))
+
+    crop_dir = os.path.join(workdir, 'cropped_images', 'test')
+    os.makedirs(crop_dir, exist_ok=True)
+    for name in _split_names(dataset_dir, 'test'):
+        image = cv2.imread(os.path.join(dataset_dir, 'test', name + '.jpg'))
+        with open(os.path.join(dataset_dir, 'test', name + '.json')) as f:
+            lps = json.load(f)['lps']
+        for i, lp in enumerate(lps):
+            poly = np.array(lp['poly_coord'])
+            (x_min, y_min), (x_max, y_max) = poly.min(axis=0), poly.max(axis=0)
+            cv2.imwrite(os.path.join(crop_dir, crop_filename(name + '.jpg', i)),
+                        image[y_min:y_max, x_min:x_max])
+
+def _run_stage(stage, workdir, options, queue):
+    # The child starts with the parent's peak RSS, so reset it before the stage runs.
+    # Where that is not possible (no /proc), the reported peak includes the parent's.
+    _reset_peak_rss()
+    os.chdir(workdir)
+    sys.path.insert(0, options['repo_root'])
+    start = time.perf_counter()
+    result = globals()[f'stage_{stage}'](workdir, **options)
+    total = time.perf_counter() - start
+    queue.put((result, total, _peak_rss_mb()))
+
+def summarize(latencies, total, peak_rss_mb):
+    """
+    Throughput and latency percentiles come from the per-image latencies; total_s
+    is the wall time of the whole stage, including imports and model loading.
+    """
+    latencies = np.asarray(latencies)
+    return {
+        'images': int(latencies.size),
+        'total_s': total,
+        'images_per_s': latencies.size / latencies.sum() if latencies.sum() > 0 else None,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000) if latencies.size else None,
+        'p95_ms': float(np.percentile(latencies, 95) * 1000) if latencies.size else None,
+        'peak_rss_mb': peak_rss_mb,
+    }
+
+def run_stage(stage, workdir, options, timeout=None):
+    """
+    Run a stage in a child process. A child that exits without a result (an
+    exception, OOM kill or segfault) or runs past `timeout` seconds is reported
+    as failed instead of blocking the suite.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_stage, args=(stage, workdir, options, queue))
+    process.start()
+    start = time.perf_counter()
+    while True:
+        try:
+            result, total, peak_rss_mb = queue.get(timeout=1)
+            break
+        except Empty:
+            if process.exitcode is not None:
+                # The result may have been put just before the process exited
+                try:
+                    result, total, peak_rss_mb = queue.get(timeout=1)
+                    break
+                except Empty:
+                    return {'failed': f'process exited with code {process.exitcode}'}
+            if timeout is not None and time.perf_counter() - start > timeout:
+                process.kill()
+                process.join()
+                return {'failed': f'timed out after {timeout:g}s'}
+    process.join()
+
+    if isinstance(result, tuple):
+        return {'skipped': result[1]}
+    return summarize(result, total, peak_rss_mb)
+
+def run_benchmarks(sizes, stages, options, seed=0, keep=False):
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+        },
+        'results': {},
+    }
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix=f'anpr-bench-{size}-')
+        try:
+            print(f'Generating {size} synthetic images in {workdir}')
+            prepare_workdir(workdir, size, seed)
+            for stage in [stage for stage in STAGES if stage in stages]:
+                summary = run_stage(stage, workdir, options, options.get('stage_timeout'))
+                results['results'].setdefault(stage, {})[str(size)] = summary
+                print(f'  {stage}: {format_summary(summary)}')
+        finally:
+            if not keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def format_summary(summary):
+    if 'skipped' in summary:
+        return f"skipped ({summary['skipped']})"
+    if 'failed' in summary:
+        return f"FAILED ({summary['failed']})"
+    return (f"{summary['images_per_s']:.1f} images/s, p50 {summary['p50_ms']:.2f} ms, "
+            f"p95 {summary['p95_ms']:.2f} ms, peak RSS {summary['peak_rss_mb']:.0f} MB")
+
+def compare(results, baseline, max_regression):
+    """
+    Print throughput and p95 changes against a stored baseline. Returns the regressions.
+    """
+    regressions = []
+    for stage, by_size in results['results'].items():
+        for size, summary in by_size.items():
+            reference = baseline.get('results', {}).get(stage, {}).get(size)
+            if reference is None or any(key in entry for key in ('skipped', 'failed')
+                                        for entry in (summary, reference)):
+                continue
+            throughput = summary['images_per_s'] / reference['images_per_s'] - 1
+            p95 = summary['p95_ms'] / reference['p95_ms'] - 1
+            print(f'{stage} @ {size}: throughput {throughput:+.1%}, p95 {p95:+.1%}')
+            if throughput < -max_regression or p95 > max_regression:
+                regressions.append((stage, size))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark each ANPR stage on synthetic data.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200], help='Dataset sizes to benchmark')
+    parser.add_argument('--stages', type=str, nargs='+', default=STAGES, choices=STAGES, help='Stages to run')
+    parser.add_argument('--weights', type=str, default=None, help='YOLO weights for the predict_boxes stage')
+    parser.add_argument('--engine', type=str, default=None, help='OCR engine for the perform_ocr stage')
+    parser.add_argument('--batch-size', type=int, default=32, help='OCR batch size')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic dataset')
+    parser.add_argument('--output', type=str, default='benchmark_results.json', help='Where to write the results')
+    parser.add_argument('--baseline', type=str, default=None, help='Results file to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.1,
+                        help='Relative slowdown that counts as a regression (default: 0.1)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated datasets')
+    parser.add_argument('--stage-timeout', type=float, default=None,
+                        help='Seconds after which a stage is killed and reported as failed')
+    args = parser.parse_args()
+
+    options = {
+        'repo_root': os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'weights': os.path.abspath(args.weights) if args.weights else None,
+        'engine': args.engine,
+        'batch_size': args.batch_size,
+        'stage_timeout': args.stage_timeout,
+    }
+    results = run_benchmarks(args.sizes, args.stages, options, seed=args.seed, keep=args.keep)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results saved to {args.output}')
+
+    failed = [(stage, size) for stage, by_size in results['results'].items()
+              for size, summary in by_size.items() if 'failed' in summary]
+    if failed:
+        print(f'Failed stages: {failed}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f'Regressions: {regressions}')
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,112 @@
+import os
+import json
+import argparse
+import cv2
+import numpy as np
+
+PLATE_DIGITS = '0123456789'
+PLATE_LETTERS = 'BCDFGHJKLMNPRSTVWXYZ'
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (2560, 1440)]
+
+def render_plate(text, char_width=30, char_height=44, margin=8):
+    """
+    Render a white plate with black characters. Returns the plate image and the
+    character boxes as [[x_min, y_min], [x_max, y_max]] in plate coordinates.
+    """
+    width = 2 * margin + char_width * len(text)
+    height = char_height + 2 * margin
+    plate = np.full((height, width, 3), 255, np.uint8)
+    cv2.rectangle(plate, (0, 0), (width - 1, height - 1), (0, 0, 0), 2)
+
+    char_boxes = []
+    for i, char in enumerate(text):
+        x = margin + i * char_width
+        cv2.putText(plate, char, (x + 2, margin + char_height - 6), cv2.FONT_HERSHEY_SIMPLEX,
+                    1.2, (0, 0, 0), 3, cv2.LINE_AA)
+        char_boxes.append([[x, margin], [x + char_width - 2, margin + char_height]])
+    return plate, char_boxes
+
+def _transform(points, M):
+    points = np.asarray(points, dtype=np.float64)
+    return points @ M[:, :2].T + M[:, 2]
+
+def place_plate(image, plate, char_boxes, center, scale, angle):
+    """
+    Draw a plate onto an image with the given scale and skew, and return its
+    UC3M-LP style polygon and character boxes in image coordinates.
+    """
+    h, w = plate.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, scale)
+    M[:, 2] += np.array(center) - np.array([w / 2, h / 2])
+
+    size = (image.shape[1], image.shape[0])
+    warped = cv2.warpAffine(plate, M, size, flags=cv2.INTER_LINEAR)
+    mask = cv2.warpAffine(np.full((h, w), 255, np.uint8), M, size, flags=cv2.INTER_NEAREST)
+    image[mask > 0] = warped[mask > 0]
+
+    corners = [[0, 0], [w, 0], [w, h], [0, h]]
+    poly_coord = np.round(_transform(corners, M)).astype(int).tolist()
+
+    characters = []
+    for (x_min, y_min), (x_max, y_max) in char_boxes:
+        box = _transform([[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]], M)
+        characters.append([np.floor(box.min(axis=0)).astype(int).tolist(),
+                           np.ceil(box.max(axis=0)).astype(int).tolist()])
+    return poly_coord, characters
+
+def make_image(rng, name, max_plates=2, max_skew=10.0):
+    """
+    Build one synthetic scene and its annotation.
+    """
+    width, height = RESOLUTIONS[rng.integers(len(RESOLUTIONS))]
+    image = rng.integers(40, 200, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    image = cv2.resize(image, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    lps = []
+    n_plates = rng.integers(1, max_plates + 1)
+    for i in range(n_plates):
+        text = ''.join(rng.choice(list(PLATE_DIGITS), 4)) + ''.join(rng.choice(list(PLATE_LETTERS), 3))
+        plate, char_boxes = render_plate(text)
+        # Plates take 10-25% of the image width and sit in their own vertical band
+        scale = width * rng.uniform(0.10, 0.25) / plate.shape[1]
+        band = height / n_plates
+        center = (width * rng.uniform(0.3, 0.7), band * (i + 0.5))
+        angle = rng.uniform(-max_skew, max_skew)
+        poly_coord, characters = place_plate(image, plate, char_boxes, center, scale, angle)
+        lps.append({
+            'lp_id': text,
+            'poly_coord': poly_coord,
+            'characters': [{'char_id': char, 'bbox_coord': box} for char, box in zip(text, characters)],
+        })
+
+    return image, {'imagename': name + '.jpg', 'lps': lps}
+
+def make_synthetic_dataset(root, n_images, test_fraction=0.2, seed=0):
+    """
+    Write a UC3M-LP style dataset: {train,test}/<name>.jpg and .json plus train.txt and test.txt.
+    """
+    rng = np.random.default_rng(seed)
+    n_test = max(1, int(n_images * test_fraction))
+    splits = {'test': n_test, 'train': n_images - n_test}
+
+    for split, count in splits.items():
+        os.makedirs(os.path.join(root, split), exist_ok=True)
+        names = []
+        for i in range(count):
+            name = f'{split}_{i:06d}'
+            image, annotation = make_image(rng, name)
+            cv2.imwrite(os.path.join(root, split, name + '.jpg'), image)
+            with open(os.path.join(root, split, name + '.json'), 'w') as f:
+                json.dump(annotation, f)
+            names.append(f'{split}/{name}.jpg')
+        with open(os.path.join(root, f'{split}.txt'), 'w') as f:
+            f.write('\n'.join(names) + '\n')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic UC3M-LP style dataset.')
+    parser.add_argument('root', type=str, help='Output directory')
+    parser.add_argument('n_images', type=int, help='Number of images')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    make_synthetic_dataset(args.root, args.n_images, seed=args.seed)
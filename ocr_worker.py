@@ -0,0 +1,11 @@
+import argparse
+from src.ocr_worker import WORKER_SOCKET, serve_worker
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep OCR engines loaded for repeated baseline.py --worker runs.")
+    parser.add_argument("--socket", type=str, default=WORKER_SOCKET, help="Unix socket to listen on.")
+    parser.add_argument("--warmup", type=str, nargs="*", default=[],
+                        help="Engines to load before the first request (e.g., 'easyocr').")
+
+    args = parser.parse_args()
+    serve_worker(args.socket, args.warmup)
@@ -0,0 +1,96 @@
+import os
+import argparse
+import pandas as pd
+from ultralytics import YOLO
+from baseline import print_cache_stats, print_engine_share, print_metrics, save_report
+from src import tracing
+from src.data_processing import batch_extract_true_labels
+from src.evaluation import BOX_COLUMNS, evaluate
+from src.image_processing import DESKEW_METHODS
+from src.ocr_cache import OCRCache
+from src.ocr_engines import PLATE_PATTERN, register_cascade
+from src.pipeline import run_pipeline
+
+def main(split, engine, weights, batch_size=32, debug_dir=None, output_csv=False, raw=False,
+         deskew_method='hough', trace=None, report_dir=None, cache_path=None, cache_max_mb=64, device=None,
+         detect_batch_size=16, prefetch=2, refine=False, tile_empty=False):
+    model = YOLO(weights)
+    cache = OCRCache(cache_path, max_bytes=cache_max_mb * 1024 * 1024) if cache_path else None
+
+    # Detect, crop, preprocess and recognize plates in memory
+    print(f"Running single-pass pipeline for split='{split}' using engine='{engine}'...")
+    results = []
+    for result in run_pipeline(model, split, engine=engine, batch_size=batch_size,
+                               processed=not raw, debug_dir=debug_dir,
+                               deskew_method=deskew_method, cache=cache, device=device,
+                               detect_batch_size=detect_batch_size, prefetch=prefetch,
+                               refine={'tile_empty': tile_empty} if refine else None):
+        results.append((result['filename'], result['ocr_text'], result['confidence'], result['engine'],
+                        *result['box']))
+    if cache is not None:
+        print_cache_stats(cache.stats())
+        cache.close()
+    pred_labels = pd.DataFrame(results, columns=['filename', 'ocr_text', 'confidence', 'engine'] + BOX_COLUMNS)
+    print_engine_share(pred_labels)
+
+    if output_csv:
+        os.makedirs("ocr_results", exist_ok=True)
+        csv_path = f"ocr_results/pipeline_results_{split}.csv"
+        pred_labels.to_csv(csv_path, index=False)
+        print(f"OCR results saved to {csv_path}")
+
+    # Load true labels
+    json_directory = f"data/{split}"
+    print(f"Extracting true labels from '{json_directory}'...")
+    true_labels = batch_extract_true_labels(json_directory)
+
+    with tracing.span('evaluate'):
+        result = evaluate(pred_labels, true_labels)
+
+    print_metrics(result['metrics'])
+    if report_dir is not None:
+        save_report(result, report_dir)
+
+    if trace is not None:
+        tracing.export(trace)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect, crop, preprocess and OCR plates in a single in-memory pass.")
+    parser.add_argument("--split", type=str, required=True, help="Dataset split (e.g., 'val', 'test').")
+    parser.add_argument("--engine", type=str, required=True, help="OCR engine to use (e.g., 'easyocr').")
+    parser.add_argument("--weights", type=str, default="runs/detect/train/weights/best.pt", help="YOLO weights for plate detection.")
+    parser.add_argument("--device", type=str, default=None, help="Detector device (default: CUDA, then MPS, then CPU).")
+    parser.add_argument("--batch-size", type=int, default=32, help="Number of crops sent to the OCR engine at once.")
+    parser.add_argument("--detect-batch-size", type=int, default=16, help="Number of images sent to the detector at once.")
+    parser.add_argument("--prefetch", type=int, default=2, help="Number of image batches decoded ahead of the detector.")
+    parser.add_argument("--refine", action="store_true",
+                        help="Re-detect borderline and small plates on full-resolution regions of interest.")
+    parser.add_argument("--tile-empty", action="store_true",
+                        help="With --refine, also search full-resolution tiles of images without a confident plate.")
+    parser.add_argument("--debug-dir", type=str, default=None, help="Optionally write raw and processed crops to this directory.")
+    parser.add_argument("--output-csv", action="store_true", help="Save OCR results to ocr_results/.")
+    parser.add_argument("--deskew-method", type=str, default="hough", choices=list(DESKEW_METHODS),
+                        help="Skew angle estimator used before OCR.")
+    parser.add_argument("--raw", action="store_true", help="Run OCR on raw crops, skipping deskew and thresholding.")
+    parser.add_argument("--min-confidence", type=float, default=0.9,
+                        help="With --engine cascade, re-read crops below this fast_plate_ocr confidence with EasyOCR.")
+    parser.add_argument("--plate-pattern", type=str, default=PLATE_PATTERN,
+                        help="With --engine cascade, re-read crops whose text does not match this regex.")
+    parser.add_argument("--cache", type=str, default=None,
+                        help="SQLite file caching OCR results by crop content (e.g. .cache/ocr.sqlite).")
+    parser.add_argument("--cache-max-mb", type=int, default=64, help="Size limit of the OCR cache file.")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Record per-stage timings and save them as JSON (plus Prometheus .prom) to this path.")
+    parser.add_argument("--report", type=str, default=None,
+                        help="Directory to save the plate matching and character confusion matrix to.")
+
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable()
+    register_cascade(min_confidence=args.min_confidence, pattern=args.plate_pattern)
+    main(split=args.split, engine=args.engine, weights=args.weights, batch_size=args.batch_size,
+         debug_dir=args.debug_dir, output_csv=args.output_csv, raw=args.raw,
+         deskew_method=args.deskew_method, trace=args.trace, report_dir=args.report,
+         cache_path=args.cache, cache_max_mb=args.cache_max_mb, device=args.device,
+         detect_batch_size=args.detect_batch_size, prefetch=args.prefetch, refine=args.refine,
+         tile_empty=args.tile_empty)
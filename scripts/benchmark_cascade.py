@@ -0,0 +1,74 @@
+import time
+import argparse
+import pandas as pd
+from src.data_processing import batch_extract_true_labels
+from src.evaluation import attach_boxes, evaluate
+from src.ocr_engines import PLATE_PATTERN, is_valid_plate, iter_batches, recognize_batch
+from scripts.benchmark_deskew import load_crops
+
+def read_all(crops, engine, batch_size=32):
+    """Scored reads of every crop and the time per crop, excluding model loading."""
+    filenames = list(crops)
+    recognize_batch([crops[filenames[0]]], engine=engine)
+    results = []
+    start = time.perf_counter()
+    for batch in iter_batches(filenames, batch_size):
+        results.extend(recognize_batch([crops[f] for f in batch], engine=engine, scored=True))
+    seconds = (time.perf_counter() - start) / len(filenames)
+    return pd.DataFrame(results, index=filenames), seconds
+
+def accuracy(texts, true_labels, crop_dir):
+    pred_labels = attach_boxes(pd.DataFrame({'filename': texts.index, 'ocr_text': texts.values}), crop_dir)
+    return evaluate(pred_labels, true_labels)['metrics']['accuracy']
+
+def main(split, thresholds, fast_engine='fast_plate_ocr', slow_engine='easyocr', pattern=PLATE_PATTERN,
+         batch_size=32, limit=None):
+    input_dir = f"cropped_images_processed/{split}"
+    print(f"Loading crops from '{input_dir}'...")
+    crops = load_crops(input_dir, limit)
+    true_labels = batch_extract_true_labels(f"data/{split}")
+    crop_dir = f"cropped_images/{split}"
+
+    # Both engines read every crop once; each threshold then replays the cascade rule
+    fast, fast_seconds = read_all(crops, fast_engine, batch_size)
+    slow, slow_seconds = read_all(crops, slow_engine, batch_size)
+    fast_valid = fast['ocr_text'].map(lambda text: is_valid_plate(text, pattern))
+    slow_valid = slow['ocr_text'].map(lambda text: is_valid_plate(text, pattern))
+
+    rows = [
+        {'setting': fast_engine, 'escalated': 0.0, 'accuracy': accuracy(fast['ocr_text'], true_labels, crop_dir),
+         'crops_per_s': 1 / fast_seconds},
+        {'setting': slow_engine, 'escalated': 1.0, 'accuracy': accuracy(slow['ocr_text'], true_labels, crop_dir),
+         'crops_per_s': 1 / slow_seconds},
+    ]
+    for threshold in thresholds:
+        escalate = (fast['confidence'].fillna(0.0) < threshold) | ~fast_valid
+        use_slow = escalate & (slow_valid | ~fast_valid)
+        texts = fast['ocr_text'].where(~use_slow, slow['ocr_text'])
+        rows.append({
+            'setting': f'cascade@{threshold:g}',
+            'escalated': escalate.mean(),
+            'accuracy': accuracy(texts, true_labels, crop_dir),
+            'crops_per_s': 1 / (fast_seconds + escalate.mean() * slow_seconds),
+        })
+
+    results = pd.DataFrame(rows).set_index('setting')
+    print(f"OCR cascade on {len(crops)} crops of split='{split}' "
+          f"(format-valid: {fast_valid.mean():.1%} {fast_engine}, {slow_valid.mean():.1%} {slow_engine}):")
+    print(results.to_string(float_format=lambda v: f"{v:.3f}"))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the accuracy/throughput tradeoff of the OCR cascade.")
+    parser.add_argument("--split", type=str, default="val", help="Dataset split (e.g., 'val', 'test').")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.7, 0.8, 0.9, 0.95, 0.99],
+                        help="Confidence thresholds below which crops go to the slow engine.")
+    parser.add_argument("--fast-engine", type=str, default="fast_plate_ocr", help="Engine that reads every crop.")
+    parser.add_argument("--slow-engine", type=str, default="easyocr", help="Engine for escalated crops.")
+    parser.add_argument("--plate-pattern", type=str, default=PLATE_PATTERN, help="Regex of valid plate texts.")
+    parser.add_argument("--batch-size", type=int, default=32, help="Number of crops sent to the OCR engine at once.")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N crops.")
+
+    args = parser.parse_args()
+    main(args.split, args.thresholds, args.fast_engine, args.slow_engine, args.plate_pattern,
+         batch_size=args.batch_size, limit=args.limit)
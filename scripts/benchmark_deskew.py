@@ -0,0 +1,85 @@
+import os
+import time
+import argparse
+import cv2
+import numpy as np
+import pandas as pd
+from src.data_processing import batch_extract_true_labels
+from src.evaluation import attach_boxes, evaluate
+from src.image_processing import DESKEW_METHODS, IMAGE_EXTENSIONS, estimate_skew_angle, rotate, binarize
+from src.ocr_engines import iter_batches, recognize_batch
+
+def load_crops(input_dir, limit=None):
+    """Decode the cropped images of a split once, so only deskewing is timed."""
+    filenames = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if limit is not None:
+        filenames = filenames[:limit]
+    crops = {}
+    for filename in filenames:
+        image = cv2.imread(os.path.join(input_dir, filename))
+        if image is not None:
+            crops[filename] = image
+    return crops
+
+def benchmark_method(crops, method, true_labels=None, engine=None, batch_size=32, crop_dir=None):
+    """
+    Time the skew estimate of a method and, if an engine is given, measure OCR accuracy.
+    Crops are matched to true plates by box IoU with the boxes saved in crop_dir.
+    """
+    angles = {}
+    durations = []
+    for filename, image in crops.items():
+        start = time.perf_counter()
+        angles[filename] = estimate_skew_angle(image, method)
+        durations.append(time.perf_counter() - start)
+    durations = np.array(durations) * 1000
+
+    row = {
+        'method': method,
+        'mean_ms': durations.mean(),
+        'p95_ms': np.percentile(durations, 95),
+        'crops_per_s': len(durations) / (durations.sum() / 1000),
+        'mean_abs_angle': np.mean(np.abs(list(angles.values()))),
+    }
+
+    if engine is not None:
+        pred_labels = []
+        for batch in iter_batches(list(crops), batch_size):
+            processed = [binarize(rotate(crops[f], angles[f])) for f in batch]
+            texts = recognize_batch(processed, engine=engine)
+            pred_labels.extend({'filename': f, 'ocr_text': t} for f, t in zip(batch, texts))
+        pred_labels = attach_boxes(pd.DataFrame(pred_labels), crop_dir)
+        row['ocr_accuracy'] = evaluate(pred_labels, true_labels)['metrics']['accuracy']
+
+    return row
+
+def main(split, methods, engine=None, batch_size=32, limit=None):
+    input_dir = f"cropped_images/{split}"
+    print(f"Loading crops from '{input_dir}'...")
+    crops = load_crops(input_dir, limit)
+
+    true_labels = batch_extract_true_labels(f"data/{split}") if engine is not None else None
+
+    rows = [benchmark_method(crops, method, true_labels, engine, batch_size, input_dir) for method in methods]
+    results = pd.DataFrame(rows).set_index('method')
+
+    # Report speed relative to the current Hough median
+    if 'hough' in results.index:
+        results['speedup'] = results.loc['hough', 'mean_ms'] / results['mean_ms']
+
+    print(f"Deskew benchmark on {len(crops)} crops of split='{split}':")
+    print(results.to_string(float_format=lambda v: f"{v:.3f}"))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare deskew methods for speed and OCR accuracy.")
+    parser.add_argument("--split", type=str, default="val", help="Dataset split (e.g., 'val', 'test').")
+    parser.add_argument("--methods", type=str, nargs="+", default=list(DESKEW_METHODS),
+                        choices=list(DESKEW_METHODS), help="Deskew methods to compare.")
+    parser.add_argument("--engine", type=str, default=None,
+                        help="OCR engine used to measure accuracy. Speed only if omitted.")
+    parser.add_argument("--batch-size", type=int, default=32, help="Number of crops sent to the OCR engine at once.")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N crops.")
+
+    args = parser.parse_args()
+    main(args.split, args.methods, engine=args.engine, batch_size=args.batch_size, limit=args.limit)
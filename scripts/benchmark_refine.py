@@ -0,0 +1,84 @@
+import os
+import time
+import argparse
+import cv2
+import numpy as np
+import pandas as pd
+from ultralytics import YOLO
+from src.data_processing import batch_extract_true_labels
+from src.evaluation import BOX_COLUMNS
+from src.model_utils import detection_crops, iter_detections, select_device
+from src.refine import COARSE_CONF
+from src.tracking import pairwise_iou
+
+MODES = ['coarse', 'refine', 'refine_tiles', 'full']
+
+def detect_full_resolution(model, split, device):
+    """Run the detector on the original images at their own size (rounded to a multiple of 32)."""
+    boxes = {}
+    image_dir = os.path.join("data", split)
+    for name in sorted(f for f in os.listdir(image_dir) if f.lower().endswith('.jpg')):
+        image = cv2.imread(os.path.join(image_dir, name))
+        if image is None:
+            continue
+        imgsz = int(np.ceil(max(image.shape[:2]) / 32) * 32)
+        pred = model.predict(image, imgsz=imgsz, device=device, verbose=False)[0].cpu().numpy()
+        boxes[name] = pred.boxes.xyxy[:, :4]
+    return boxes
+
+def detect_coarse_to_fine(model, split, device, refine=None):
+    """Coarse detection on the downscaled images, optionally refined on the originals."""
+    boxes = {}
+    conf = None if refine is None else refine.get('coarse_conf', COARSE_CONF)
+    for name, pred in iter_detections(model, split, device=device, conf=conf):
+        image = cv2.imread(os.path.join("data", split, name))
+        if image is None:
+            continue
+        boxes[name], _, _ = detection_crops(model, pred, image, refine=refine, device=device)
+    return boxes
+
+def recall(boxes, true_labels, small_width, iou_threshold=0.5):
+    """Recall over all true plates and over plates narrower than small_width pixels."""
+    found = []
+    for name, plates in true_labels.groupby('filename', observed=True):
+        true_boxes = plates[BOX_COLUMNS].to_numpy(dtype=np.float64)
+        pred_boxes = boxes.get(str(name), np.zeros((0, 4)))
+        iou = pairwise_iou(true_boxes, pred_boxes) if len(pred_boxes) else np.zeros((len(true_boxes), 1))
+        found.extend(zip(iou.max(axis=1) >= iou_threshold, true_boxes[:, 2] - true_boxes[:, 0] < small_width))
+    found = np.array(found, dtype=bool).reshape(-1, 2)
+    small = found[found[:, 1], 0]
+    return found[:, 0].mean(), small.mean() if small.size else np.nan, int(small.size)
+
+def main(split, weights, modes, small_width=60, device=None):
+    model = YOLO(weights)
+    device = select_device(device)
+    true_labels = batch_extract_true_labels(f"data/{split}")
+
+    rows = []
+    for mode in modes:
+        start = time.perf_counter()
+        if mode == 'full':
+            boxes = detect_full_resolution(model, split, device)
+        else:
+            refine = {'coarse': None, 'refine': {}, 'refine_tiles': {'tile_empty': True}}[mode]
+            boxes = detect_coarse_to_fine(model, split, device, refine)
+        seconds = time.perf_counter() - start
+        all_recall, small_recall, n_small = recall(boxes, true_labels, small_width)
+        rows.append({'mode': mode, 'recall': all_recall, 'small_recall': small_recall, 'small_plates': n_small,
+                     'boxes': sum(len(b) for b in boxes.values()), 'images_per_s': len(boxes) / seconds})
+
+    results = pd.DataFrame(rows).set_index('mode')
+    print(f"Detection on split='{split}' (small plates: narrower than {small_width}px):")
+    print(results.to_string(float_format=lambda v: f"{v:.3f}"))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare coarse, coarse-to-fine and full-resolution detection.")
+    parser.add_argument("--split", type=str, default="val", help="Dataset split (e.g., 'val', 'test').")
+    parser.add_argument("--weights", type=str, default="runs/detect/train/weights/best.pt", help="YOLO weights for plate detection.")
+    parser.add_argument("--modes", type=str, nargs="+", default=MODES, choices=MODES, help="Detection modes to compare.")
+    parser.add_argument("--small-width", type=int, default=60, help="Plates narrower than this (px) count as small.")
+    parser.add_argument("--device", type=str, default=None, help="Detector device (default: CUDA, then MPS, then CPU).")
+
+    args = parser.parse_args()
+    main(args.split, args.weights, args.modes, small_width=args.small_width, device=args.device)
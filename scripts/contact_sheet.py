@@ -0,0 +1,59 @@
+import os
+import time
+import argparse
+import pandas as pd
+from src.contact_sheet import THUMBNAIL_CACHE_DIR, render_contact_sheets
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+def load_samples(split, matches_path=None, failures=False):
+    """
+    Crops to show: the predictions of an evaluation report, or every processed crop of the split.
+    """
+    if matches_path is None:
+        processed_dir = f"cropped_images_processed/{split}"
+        filenames = sorted(entry.name for entry in os.scandir(processed_dir)
+                           if entry.name.lower().endswith(IMAGE_EXTENSIONS))
+        return pd.DataFrame({'filename': filenames})
+
+    matches = pd.read_csv(matches_path, dtype={'ocr_text': str, 'true_lp_text': str})
+    # True plates that no crop was matched to have no image to show
+    missed = matches['filename'].isna()
+    if missed.any():
+        print(f"Skipping {missed.sum()} true plates without a matched crop")
+    samples = matches[~missed]
+    if failures:
+        samples = samples[samples['ocr_text'].fillna('') != samples['true_lp_text'].fillna('')]
+    return samples.sort_values('filename')
+
+def main(split, matches_path=None, failures=False, output_dir=None, columns=4, rows=25, limit=None,
+         cache_dir=THUMBNAIL_CACHE_DIR, workers=None):
+    samples = load_samples(split, matches_path, failures)
+    if limit is not None:
+        samples = samples.head(limit)
+    output_dir = output_dir or f"contact_sheets/{split}"
+
+    start = time.perf_counter()
+    pages = render_contact_sheets(samples, f"cropped_images/{split}", f"cropped_images_processed/{split}",
+                                  output_dir, columns, rows, cache_dir=cache_dir, workers=workers)
+    print(f"Rendered {len(samples)} crops on {len(pages)} pages to {output_dir} "
+          f"in {time.perf_counter() - start:.2f}s")
+    return pages
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render original/processed/OCR crop triplets as paged grid images.")
+    parser.add_argument("--split", type=str, default="val", help="Dataset split (e.g., 'val', 'test').")
+    parser.add_argument("--matches", type=str, default=None,
+                        help="matches.csv of baseline.py --report, to overlay predicted and true texts.")
+    parser.add_argument("--failures", action="store_true", help="With --matches, only show wrongly read plates.")
+    parser.add_argument("--output", type=str, default=None, help="Output folder (default: contact_sheets/<split>).")
+    parser.add_argument("--columns", type=int, default=4, help="Triplets per grid row.")
+    parser.add_argument("--rows", type=int, default=25, help="Grid rows per page.")
+    parser.add_argument("--limit", type=int, default=None, help="Only show the first N crops.")
+    parser.add_argument("--cache-dir", type=str, default=THUMBNAIL_CACHE_DIR,
+                        help="Folder of cached thumbnails, reused while the source files are unchanged.")
+    parser.add_argument("--workers", type=int, default=None, help="Threads building thumbnails (default: all cores).")
+
+    args = parser.parse_args()
+    main(args.split, args.matches, args.failures, args.output, args.columns, args.rows, args.limit,
+         args.cache_dir, args.workers)
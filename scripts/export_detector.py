@@ -0,0 +1,27 @@
+import argparse
+from src.detector_export import compare_detectors, export_detector
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the plate detector for CPU inference and compare it to PyTorch.")
+    parser.add_argument("--weights", type=str, default="runs/detect/train/weights/best.pt", help="Trained YOLO weights.")
+    parser.add_argument("--formats", type=str, nargs='+', default=['onnx'], choices=['onnx', 'openvino'],
+                        help="Runtimes to export to.")
+    parser.add_argument("--int8", action="store_true", help="Also export INT8 models calibrated on the val split.")
+    parser.add_argument("--calibration-images", type=int, default=300, help="Number of val images used for calibration.")
+    parser.add_argument("--data", type=str, default="cfg.yaml", help="Dataset config used for validation.")
+    parser.add_argument("--imgsz", type=int, default=None,
+                        help="Detector input size (default: the size the weights were trained at).")
+    parser.add_argument("--report", type=str, default="export_report.csv", help="Where to save the comparison.")
+    parser.add_argument("--no-report", action="store_true", help="Only export, skip validation and timing.")
+    args = parser.parse_args()
+
+    exported = export_detector(args.weights, args.formats, int8=args.int8, data=args.data,
+                               imgsz=args.imgsz, limit=args.calibration_images)
+    for name, path in exported.items():
+        print(f"Exported {name}: {path}")
+
+    if not args.no_report:
+        report = compare_detectors({'pytorch': args.weights, **exported}, data=args.data, imgsz=args.imgsz)
+        print(report.to_string(index=False, float_format='{:.3f}'.format))
+        report.to_csv(args.report, index=False)
+        print(f"Report saved to {args.report}")
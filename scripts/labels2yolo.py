@@ -7,8 +7,10 @@ import cv2
 import argparse
 from tqdm import tqdm
 import scripts.utils as utils
-import shutil
-import random
+import hashlib
+from functools import partial
+from multiprocessing import Pool
+from src.splits import SPLITS_FILE, load_or_create_split_manifest
 
 def create_yolo_bbox_string(class_id, bbox, img_width, img_height):
     x_center = (bbox[0][0] + bbox[1][0]) / (2 * img_width)
@@ -36,10 +38,87 @@ def write_split_files(directory, train_files, val_files, test_files):
     with open(os.path.join(directory, 'test.txt'), 'w') as f:
         f.write('\n'.join(test_paths))
 
-def transform_dataset(input_directory, lp_size, ocr_size):
-    train_txt_path = os.path.join(input_directory, 'train.txt')
-    test_txt_path = os.path.join(input_directory, 'test.txt')
+BUILD_MANIFEST_NAME = 'build_manifest.json'
 
+def file_digest(path, previous=None):
+    """
+    Return the size, mtime and SHA-1 of a file. The hash of the previous build is
+    reused when size and mtime did not change, so unchanged files are not read.
+    """
+    stat = os.stat(path)
+    if previous is not None and previous['size'] == stat.st_size and \
+            previous['mtime_ns'] == stat.st_mtime_ns:
+        return previous
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1.hexdigest()}
+
+def input_signature(source_path, target_split, lp_size, ocr_size, previous=None):
+    """Describe everything the outputs of one source image depend on."""
+    return {
+        'jpg': file_digest(source_path + '.jpg', previous['jpg'] if previous else None),
+        'json': file_digest(source_path + '.json', previous['json'] if previous else None),
+        'split': target_split,
+        'lp_size': lp_size,
+        'ocr_size': ocr_size,
+    }
+
+def _same_lp_inputs(previous, current):
+    return previous['jpg']['sha1'] == current['jpg']['sha1'] and \
+        previous['split'] == current['split'] and previous['lp_size'] == current['lp_size']
+
+def _moved_split_only(previous, current):
+    return {**previous, 'split': current['split']} == current and previous['split'] != current['split']
+
+def _with_split(path, split, sep=os.sep):
+    # Output paths look like LP/images/<split>/<file> and records like images/<split>/<file>
+    parts = path.split(sep)
+    parts[-2] = split
+    return sep.join(parts)
+
+def relocate_outputs(entry, inputs, output_root):
+    """
+    Move the outputs of an image whose only change is its split, instead of
+    converting it again. Returns the updated build entry.
+    """
+    split = inputs['split']
+    outputs = []
+    for path in entry['outputs']:
+        new_path = _with_split(path, split)
+        os.replace(os.path.join(output_root, path), os.path.join(output_root, new_path))
+        outputs.append(new_path)
+    lp_record = entry['lp_record']
+    if lp_record is not None:
+        lp_record = {**lp_record, 'image': _with_split(lp_record['image'], split, '/')}
+    ocr_records = [{**record, 'image': _with_split(record['image'], split, '/')} for record in entry['ocr_records']]
+    return {'inputs': inputs, 'outputs': outputs, 'lp_record': lp_record, 'ocr_records': ocr_records}
+
+def load_build_manifest(path):
+    """Load the entries of the previous build, or nothing if there was none."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)['entries']
+
+def save_build_manifest(path, entries):
+    write_text_atomic(path, json.dumps({'entries': entries}))
+
+def remove_stale_outputs(previous_entries, entries, output_root):
+    """Delete files from the previous build that the current build did not produce."""
+    current_outputs = {path for entry in entries.values() for path in entry['outputs']}
+    removed = 0
+    for entry in previous_entries.values():
+        for path in entry['outputs']:
+            full_path = os.path.join(output_root, path)
+            if path not in current_outputs and os.path.exists(full_path):
+                os.remove(full_path)
+                removed += 1
+    return removed
+
+def transform_dataset(input_directory, lp_size, ocr_size, workers=1, manifest=False, force=False,
+                      splits_path=SPLITS_FILE, seed=None, val_fraction=None, resplit=False):
     # Normalize input directory
     input_directory = os.path.normpath(input_directory)
 
@@ -57,34 +136,41 @@ def transform_dataset(input_directory, lp_size, ocr_size):
 
     ocr_classes = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
 
+    # Load the build manifest of the previous run; a forced rebuild still needs it to delete stale outputs
+    output_root = os.path.dirname(lp_directory)
+    build_manifest_path = os.path.join(output_root, BUILD_MANIFEST_NAME)
+    previous_entries = load_build_manifest(build_manifest_path)
+    entries = {}
+
+    # The train/val/test membership comes from the seeded split manifest
+    splits = load_or_create_split_manifest(splits_path, input_directory, val_fraction, seed,
+                                           resplit)['splits']
+    test_filenames = splits['test']
+    train_subset = splits['train']
+    val_subset = splits['val']
+
     # Process test set first
     print('Processing test split')
-    with open(test_txt_path, 'r') as f:
-        test_filenames = [os.path.splitext(os.path.basename(line.strip()))[0] 
-                         for line in f.readlines()]
-    
     process_files(test_filenames, 'test', 'test', input_directory, lp_directory, 
-                 ocr_directory, ocr_classes, lp_size, ocr_size)
-
-    # Process train set and create train/val split
-    print('Processing train split')
-    with open(train_txt_path, 'r') as f:
-        train_filenames = [os.path.splitext(os.path.basename(line.strip()))[0] 
-                          for line in f.readlines()]
-    
-    # Randomly shuffle and split train data
-    random.shuffle(train_filenames)
-    split_idx = int(len(train_filenames) * 0.8)
-    train_subset = train_filenames[:split_idx]
-    val_subset = train_filenames[split_idx:]
+                 ocr_directory, ocr_classes, lp_size, ocr_size, workers, manifest,
+                 previous_entries, entries, force)
 
     # Process train subset
+    print('Processing train split')
     process_files(train_subset, 'train', 'train', input_directory, lp_directory, 
-                 ocr_directory, ocr_classes, lp_size, ocr_size)
+                 ocr_directory, ocr_classes, lp_size, ocr_size, workers, manifest,
+                 previous_entries, entries, force)
     
     # Process validation subset
     process_files(val_subset, 'train', 'val', input_directory, lp_directory, 
-                 ocr_directory, ocr_classes, lp_size, ocr_size)
+                 ocr_directory, ocr_classes, lp_size, ocr_size, workers, manifest,
+                 previous_entries, entries, force)
+
+    # Delete outputs that no current source image produces anymore
+    removed = remove_stale_outputs(previous_entries, entries, output_root)
+    if removed:
+        print(f'Removed {removed} stale output files')
+    save_build_manifest(build_manifest_path, entries)
 
     # Create split files for LP detection
     print('Creating split files for LP detection')
@@ -116,81 +202,213 @@ def transform_dataset(input_directory, lp_size, ocr_size):
 
     write_split_files(ocr_directory, ocr_train_files, ocr_val_files, ocr_test_files)
 
+def write_text_atomic(path, text):
+    """Write a file in one call, replacing any previous version atomically."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_label_manifest(path, records):
+    """Write one JSON line per image with its image path and YOLO labels."""
+    write_text_atomic(path, ''.join(json.dumps(record) + '\n' for record in records))
+
 def process_files(filenames, source_split, target_split, input_directory, lp_directory, 
-                 ocr_directory, ocr_classes, lp_size, ocr_size):
-    for filename in tqdm(filenames):
-        # Load image
-        img_path = os.path.join(input_directory, source_split, filename + '.jpg')
-        img = cv2.imread(img_path)
-        img_height, img_width, _ = img.shape
-
-        # Load JSON label
-        json_path = os.path.join(input_directory, source_split, filename + '.json')
-        with open(json_path, 'r') as f:
-            data = json.load(f)
+                 ocr_directory, ocr_classes, lp_size, ocr_size, workers=1, manifest=False,
+                 previous_entries=None, entries=None, force=False):
+    """
+    Convert a list of images. When previous_entries is given, images whose inputs
+    are unchanged since the last build are skipped and their entries reused.
+    With force, every image is rebuilt.
+    """
+    output_root = os.path.dirname(lp_directory)
+    jobs = []
+    reused = {}
+    moved = 0
+    for filename in filenames:
+        key = f'{source_split}/{filename}'
+        previous = None if previous_entries is None or force else previous_entries.get(key)
+        inputs = input_signature(os.path.join(input_directory, source_split, filename),
+                                 target_split, lp_size, ocr_size,
+                                 previous['inputs'] if previous else None)
+        if previous is not None and previous['inputs'] == inputs and \
+                all(os.path.exists(os.path.join(output_root, path)) for path in previous['outputs']):
+            reused[filename] = previous
+            continue
+        if previous is not None and _moved_split_only(previous['inputs'], inputs) and \
+                all(os.path.exists(os.path.join(output_root, path)) for path in previous['outputs']):
+            reused[filename] = relocate_outputs(previous, inputs, output_root)
+            moved += 1
+            continue
+        # The LP image only depends on the jpg, the split and lp_size
+        write_lp_image = previous is None or not _same_lp_inputs(previous['inputs'], inputs) or \
+            not os.path.exists(os.path.join(lp_directory, 'images', target_split, f'{filename}.jpg'))
+        jobs.append((filename, inputs, write_lp_image))
+
+    print(f'{target_split}: {len(jobs)} images to rebuild, {len(reused) - moved} unchanged and skipped, '
+          f'{moved} moved from another split')
+
+    process = partial(_process_job, source_split=source_split, target_split=target_split,
+                      input_directory=input_directory, lp_directory=lp_directory,
+                      ocr_directory=ocr_directory, ocr_classes=ocr_classes,
+                      lp_size=lp_size, ocr_size=ocr_size)
+
+    if workers <= 1 or len(jobs) <= 1:
+        results = map(process, jobs)
+        pool = None
+    else:
+        # Every image is converted independently, so the output does not depend on the worker count
+        chunksize = max(1, len(jobs) // (workers * 16))
+        pool = Pool(workers, initializer=_init_worker)
+        results = pool.imap(process, jobs, chunksize=chunksize)
+
+    built = {}
+    try:
+        for (filename, inputs, _), (lp_record, ocr_records, outputs) in tqdm(zip(jobs, results),
+                                                                           total=len(jobs)):
+            built[filename] = {
+                'inputs': inputs,
+                'outputs': [os.path.relpath(path, output_root) for path in outputs],
+                'lp_record': lp_record,
+                'ocr_records': ocr_records,
+            }
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    lp_records = []
+    ocr_records = []
+    for filename in filenames:
+        entry = built[filename] if filename in built else reused[filename]
+        if entries is not None:
+            entries[f'{source_split}/{filename}'] = entry
+        if entry['lp_record'] is not None:
+            lp_records.append(entry['lp_record'])
+        ocr_records.extend(entry['ocr_records'])
+
+    if manifest:
+        # A single packed file per split, so readers do not have to stat every label file
+        write_label_manifest(os.path.join(lp_directory, f'labels_{target_split}.jsonl'), lp_records)
+        write_label_manifest(os.path.join(ocr_directory, f'labels_{target_split}.jsonl'), ocr_records)
+
+def _process_job(job, **kwargs):
+    filename, _, write_lp_image = job
+    return process_image(filename, write_lp_image=write_lp_image, **kwargs)
+
+def _init_worker():
+    # Avoid oversubscribing cores with OpenCV's own thread pool inside each worker
+    cv2.setNumThreads(1)
+
+def process_image(filename, source_split, target_split, input_directory, lp_directory,
+                  ocr_directory, ocr_classes, lp_size, ocr_size, write_lp_image=True):
+    """
+    Convert one image and its plates. Label lines are built in memory and every
+    label file is written exactly once. Returns the LP and OCR manifest records
+    and the paths of all output files.
+    """
+    # Load image
+    img_path = os.path.join(input_directory, source_split, filename + '.jpg')
+    img = cv2.imread(img_path)
+    img_height, img_width, _ = img.shape
+
+    # Load JSON label
+    json_path = os.path.join(input_directory, source_split, filename + '.json')
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+
+    if not data['lps']:
+        return None, [], []
+
+    # Write license plate image once, whatever the number of plates
+    lp_output_path = os.path.join(lp_directory, 'images', 
+        target_split, f'{filename}.jpg')
+    if write_lp_image:
+        rescale_factor_lp = lp_size / max(img_height, img_width)
+        # Resize license plate to desired size
+        lp_img_resized = cv2.resize(img, (int(img_width * rescale_factor_lp), 
+                                          int(img_height * rescale_factor_lp)))
+        cv2.imwrite(lp_output_path, lp_img_resized)
+
+    outputs = [lp_output_path]
+    lp_lines = []
+    ocr_records = []
+
+    # License Plate Detection Dataset
+    for lp_data in data['lps']:
+        lp_id = lp_data['lp_id']
+        poly_coord = lp_data['poly_coord']
+
+        # Convert polygonal annotation to rectangular bbox
+        lp_bbox = utils.poly2bbox(poly_coord)
+
+        # YOLO bbox annotation for license plate
+        lp_lines.append(create_yolo_bbox_string(0, lp_bbox, img_width, img_height))
+
+        # Write OCR image
+        ocr_output_path = os.path.join(ocr_directory, 'images', 
+            target_split, f'{filename}_{lp_id}.jpg')
+        # Crop img to lp_bbox; the view is only read, so no copy is needed
+        ocr_img = img[lp_bbox[0][1]:lp_bbox[1][1], lp_bbox[0][0]:lp_bbox[1][0]]
+        ocr_img_offset_x = lp_bbox[0][0]
+        ocr_img_offset_y = lp_bbox[0][1]
+        ocr_height, ocr_width, _ = ocr_img.shape
+        # Resize OCR image to desired size
+        rescale_factor_ocr = ocr_size / max(ocr_height, ocr_width)
+        ocr_img_resized = cv2.resize(ocr_img, (int(ocr_width * rescale_factor_ocr),
+                                               int(ocr_height * rescale_factor_ocr)))
+        cv2.imwrite(ocr_output_path, ocr_img_resized)
+        outputs.append(ocr_output_path)
+
+        # OCR Detection Dataset
+        ocr_lines = []
+        for char_data in lp_data['characters']:
+            char_id = char_data['char_id']
+            bbox = char_data['bbox_coord']
+            bbox = [[bbox[0][0] - ocr_img_offset_x, bbox[0][1] - ocr_img_offset_y],
+                    [bbox[1][0] - ocr_img_offset_x, bbox[1][1] - ocr_img_offset_y]]
+            class_id = ocr_classes.index(char_id)
+
+            # YOLO bbox annotation for character
+            ocr_lines.append(create_yolo_bbox_string(class_id, bbox, ocr_width, ocr_height))
+
+        # Written even without characters, so the labels of an earlier build do not survive
+        ocr_yolo_path = os.path.join(ocr_directory, 'labels', target_split,
+                                     f'{filename}_{lp_id}.txt')
+        write_text_atomic(ocr_yolo_path, ''.join(line + '\n' for line in ocr_lines))
+        outputs.append(ocr_yolo_path)
+        ocr_records.append({'image': f'images/{target_split}/{filename}_{lp_id}.jpg',
+                            'labels': ocr_lines})
+
+    lp_yolo_path = os.path.join(lp_directory, 'labels',
+        target_split, f'{filename}.txt')
+    write_text_atomic(lp_yolo_path, '\n'.join(lp_lines) + '\n')
+    outputs.append(lp_yolo_path)
+    lp_record = {'image': f'images/{target_split}/{filename}.jpg', 'labels': lp_lines}
 
-        # License Plate Detection Dataset
-        for lp_data in data['lps']:
-            lp_img = img.copy()
-            lp_id = lp_data['lp_id']
-            poly_coord = lp_data['poly_coord']
-
-            # Convert polygonal annotation to rectangular bbox
-            lp_bbox = utils.poly2bbox(poly_coord)
-
-            # Write license plate image
-            lp_output_path = os.path.join(lp_directory, 'images', 
-                target_split, f'{filename}.jpg')
-            # Check if file exists
-            if not os.path.isfile(os.path.dirname(lp_output_path)):
-                rescale_factor_lp = lp_size / max(img_height, img_width)
-                # Resize license plate to desired size
-                lp_img_resized = cv2.resize(lp_img, (int(img_width * rescale_factor_lp), 
-                                                    int(img_height * rescale_factor_lp)))
-                cv2.imwrite(lp_output_path, lp_img_resized)
-
-            # Write YOLO bbox annotation for license plate
-            lp_yolo_path = os.path.join(lp_directory, 'labels',
-                target_split, f'{filename}.txt')
-
-            append_write_lp = 'a' if os.path.exists(lp_yolo_path) else 'w'
-            with open(lp_yolo_path, append_write_lp) as lp_f:
-                lp_f.write(create_yolo_bbox_string(0, lp_bbox, img_width, img_height) + '\n')
-
-            # Write OCR image
-            ocr_output_path = os.path.join(ocr_directory, 'images', 
-                target_split, f'{filename}_{lp_id}.jpg')
-            # Crop lp_img to lp_bbox
-            ocr_img = lp_img[lp_bbox[0][1]:lp_bbox[1][1], lp_bbox[0][0]:lp_bbox[1][0]]
-            ocr_img_offset_x = lp_bbox[0][0]
-            ocr_img_offset_y = lp_bbox[0][1]
-            ocr_height, ocr_width, _ = ocr_img.shape
-            # Resize OCR image to desired size
-            rescale_factor_ocr = ocr_size / max(ocr_height, ocr_width)
-            ocr_img_resized = cv2.resize(ocr_img, (int(ocr_width * rescale_factor_ocr),
-                                                   int(ocr_height * rescale_factor_ocr)))
-            cv2.imwrite(ocr_output_path, ocr_img_resized)
-
-            # OCR Detection Dataset
-            for char_data in lp_data['characters']:
-                char_id = char_data['char_id']
-                bbox = char_data['bbox_coord']
-                bbox = [[bbox[0][0] - ocr_img_offset_x, bbox[0][1] - ocr_img_offset_y],
-                        [bbox[1][0] - ocr_img_offset_x, bbox[1][1] - ocr_img_offset_y]]
-                class_id = ocr_classes.index(char_id)
-
-                # Write YOLO bbox annotation for character
-                ocr_yolo_path = os.path.join(ocr_directory, 'labels', target_split,
-                                             f'{filename}_{lp_id}.txt')
-                append_write_ocr = 'a' if os.path.exists(ocr_yolo_path) else 'w'
-                with open(ocr_yolo_path, append_write_ocr) as ocr_f:
-                    ocr_f.write(create_yolo_bbox_string(class_id, bbox, ocr_width, ocr_height) + '\n')
+    return lp_record, ocr_records, outputs
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('input_directory', type=str, help='Path to input dataset')
     parser.add_argument('lp_size', type=int, help='YOLO input size for LP detection')
     parser.add_argument('ocr_size', type=int, help='YOLO input size for OCR detection')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes used to convert images (default: 1)')
+    parser.add_argument('--manifest', action='store_true',
+                        help='Also write one labels_<split>.jsonl manifest per split')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every image instead of reusing unchanged ones; stale outputs are still removed')
+    parser.add_argument('--splits', type=str, default=SPLITS_FILE,
+                        help='Split manifest to follow; created if missing (default: splits.json)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed of a new train/val split (default: 0); must match an existing manifest')
+    parser.add_argument('--val-fraction', type=float, default=None,
+                        help='Fraction of the UC3M-LP train split used for val in a new split (default: 0.2)')
+    parser.add_argument('--resplit', action='store_true',
+                        help='Replace the split manifest with a new split from --seed and --val-fraction')
     args = parser.parse_args()
     
-    transform_dataset(args.input_directory, args.lp_size, args.ocr_size)
\ No newline at end of file
+    transform_dataset(args.input_directory, args.lp_size, args.ocr_size, args.workers,
+                      args.manifest, args.force, args.splits, args.seed, args.val_fraction,
+                      args.resplit)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+async def _request(reader, writer, body):
+    writer.write((f'POST /recognize HTTP/1.1\r\nHost: anpr\r\nContent-Type: application/octet-stream\r\n'
+                  f'Content-Length: {len(body)}\r\n\r\n').encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+async def _client(open_connection, bodies, counter, n_requests, results):
+    reader, writer = await open_connection()
+    try:
+        while counter[0] < n_requests:
+            i = counter[0]
+            counter[0] += 1
+            start = time.perf_counter()
+            try:
+                status, _ = await _request(reader, writer, bodies[i % len(bodies)])
+            except (ConnectionError, asyncio.IncompleteReadError):
+                results.append(('error', time.perf_counter() - start))
+                reader, writer = await open_connection()
+                continue
+            results.append((status, time.perf_counter() - start))
+    finally:
+        writer.close()
+
+async def run_load_test(bodies, n_requests, concurrency, host='127.0.0.1', port=8000, unix_path=None):
+    """
+    Send n_requests images from `concurrency` keep-alive connections. Returns
+    (status, latency) pairs and the wall time.
+    """
+    if unix_path is not None:
+        open_connection = lambda: asyncio.open_unix_connection(unix_path)
+    else:
+        open_connection = lambda: asyncio.open_connection(host, port)
+    counter, results = [0], []
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(open_connection, bodies, counter, n_requests, results)
+                           for _ in range(concurrency)])
+    return results, time.perf_counter() - start
+
+def summarize(results, wall_time):
+    ok = np.array([latency for status, latency in results if status == 200])
+    return {
+        'requests': len(results),
+        'ok': int(ok.size),
+        'rejected': sum(status == 503 for status, _ in results),
+        'errors': sum(status not in (200, 503) for status, _ in results),
+        'throughput_rps': ok.size / wall_time if wall_time else 0.0,
+        'p50_ms': float(np.percentile(ok, 50) * 1000) if ok.size else None,
+        'p95_ms': float(np.percentile(ok, 95) * 1000) if ok.size else None,
+        'p99_ms': float(np.percentile(ok, 99) * 1000) if ok.size else None,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the plate recognition server.")
+    parser.add_argument("--images", type=str, required=True, help="Directory of images to send.")
+    parser.add_argument("--requests", type=int, default=200, help="Total number of requests.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent connections.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Server address.")
+    parser.add_argument("--port", type=int, default=8000, help="Server port.")
+    parser.add_argument("--unix", type=str, default=None, help="Connect to this unix socket instead of TCP.")
+    parser.add_argument("--output", type=str, default=None, help="Save the summary as JSON.")
+    args = parser.parse_args()
+
+    names = sorted(f for f in os.listdir(args.images) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+    bodies = []
+    for name in names:
+        with open(os.path.join(args.images, name), 'rb') as f:
+            bodies.append(f.read())
+
+    results, wall_time = asyncio.run(run_load_test(bodies, args.requests, args.concurrency,
+                                                   args.host, args.port, args.unix))
+    summary = summarize(results, wall_time)
+    print(f"{summary['ok']}/{summary['requests']} ok, {summary['rejected']} rejected, {summary['errors']} errors")
+    if summary['ok']:
+        print(f"Throughput: {summary['throughput_rps']:.1f} requests/s")
+        print(f"Latency: p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary saved to {args.output}")
@@ -0,0 +1,74 @@
+import os
+import json
+import argparse
+import cv2
+import numpy as np
+
+def zoom_frames(image, n_frames, start_zoom=0.6, end_zoom=1.0, drift=0.05, blur=7):
+    """
+    Simulate a vehicle approaching the camera: the view zooms in from start_zoom to
+    end_zoom while drifting sideways, and motion blur fades out over the sequence.
+    """
+    h, w = image.shape[:2]
+    for i in range(n_frames):
+        t = i / max(1, n_frames - 1)
+        zoom = start_zoom + (end_zoom - start_zoom) * t
+        # The frame shows the image shrunk by `zoom` on a gray background
+        M = np.array([[zoom, 0, (1 - zoom) * w / 2 + drift * w * (t - 0.5)],
+                      [0, zoom, (1 - zoom) * h / 2]])
+        frame = cv2.warpAffine(image, M, (w, h), borderMode=cv2.BORDER_CONSTANT, borderValue=(128, 128, 128))
+        k = int(round(blur * (1 - t)))
+        if k > 1:
+            kernel = np.zeros((k, k), np.float32)
+            kernel[k // 2, :] = 1.0 / k
+            frame = cv2.filter2D(frame, -1, kernel)
+        yield frame
+
+def make_frame_sequence(input_dir, output_dir, n_vehicles=5, frames_per_vehicle=30, gap=20, seed=0):
+    """
+    Chain zoom sequences of still images (one "vehicle" each) separated by empty
+    frames, and write the plates expected for every vehicle to truth.json.
+    """
+    rng = np.random.default_rng(seed)
+    names = sorted(f for f in os.listdir(input_dir) if f.endswith('.jpg'))
+    names = [names[i] for i in rng.choice(len(names), min(n_vehicles, len(names)), replace=False)]
+    os.makedirs(output_dir, exist_ok=True)
+
+    frame_idx = 0
+    truth = []
+    size = None
+    for name in names:
+        image = cv2.imread(os.path.join(input_dir, name))
+        # All frames of a video share one size
+        size = size or (image.shape[1], image.shape[0])
+        image = cv2.resize(image, size)
+        with open(os.path.join(input_dir, os.path.splitext(name)[0] + '.json')) as f:
+            plates = [lp['lp_id'] for lp in json.load(f)['lps']]
+
+        first_frame = frame_idx
+        for frame in zoom_frames(image, frames_per_vehicle):
+            cv2.imwrite(os.path.join(output_dir, f'frame_{frame_idx:06d}.jpg'), frame)
+            frame_idx += 1
+        truth.append({'source': name, 'plates': plates, 'first_frame': first_frame, 'last_frame': frame_idx - 1})
+
+        empty = np.full((size[1], size[0], 3), 128, np.uint8)
+        for _ in range(gap):
+            cv2.imwrite(os.path.join(output_dir, f'frame_{frame_idx:06d}.jpg'), empty)
+            frame_idx += 1
+
+    with open(os.path.join(output_dir, 'truth.json'), 'w') as f:
+        json.dump(truth, f, indent=2)
+    print(f"Wrote {frame_idx} frames of {len(truth)} vehicles to {output_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Make a synthetic frame sequence from still images.")
+    parser.add_argument("--input-dir", type=str, default="data/val", help="Directory of images with UC3M-LP JSON annotations.")
+    parser.add_argument("--output-dir", type=str, required=True, help="Where to write the frames.")
+    parser.add_argument("--vehicles", type=int, default=5, help="Number of still images to animate.")
+    parser.add_argument("--frames", type=int, default=30, help="Frames per vehicle.")
+    parser.add_argument("--gap", type=int, default=20, help="Empty frames between vehicles.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for picking the images.")
+    args = parser.parse_args()
+
+    make_frame_sequence(args.input_dir, args.output_dir, n_vehicles=args.vehicles,
+                        frames_per_vehicle=args.frames, gap=args.gap, seed=args.seed)
@@ -0,0 +1,46 @@
+import sys
+import time
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+
+def import_seconds(module, repeats=5):
+    """Median wall time of a fresh interpreter importing the module."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', f'import {module}'], check=True)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def slowest_imports(module, top=10):
+    """Packages with the largest cumulative import time (-X importtime), in seconds."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only top-level packages, or the whole tree would be listed
+        if name.strip().count('.') == 0:
+            rows.append({'package': name.strip(), 'seconds': int(cumulative) / 1e6})
+    return pd.DataFrame(rows).groupby('package')['seconds'].max().nlargest(top)
+
+def main(modules, repeats=5, top=10):
+    baseline = import_seconds('sys', repeats)
+    for module in modules:
+        seconds = import_seconds(module, repeats)
+        print(f"import {module}: {seconds - baseline:.3f}s (interpreter startup {baseline:.3f}s excluded)")
+        print(slowest_imports(module, top).to_string(float_format=lambda v: f"{v:.3f}s"))
+        print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import time of the CLI modules.")
+    parser.add_argument("modules", type=str, nargs="*", default=["baseline"], help="Modules to import.")
+    parser.add_argument("--repeats", type=int, default=5, help="Imports per module; the median is reported.")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest packages to list.")
+
+    args = parser.parse_args()
+    main(args.modules, repeats=args.repeats, top=args.top)
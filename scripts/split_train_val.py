@@ -1,32 +1,42 @@
 import os
-import shutil
-
-def main():
-    val_path_yolo = 'datasets/data-yolo/LP/images/val'
-    train_path = 'data/train'
-    val_new_path = 'data/val'
-
-    # Get validation filenames (without extension)
-    val_filenames = [os.path.splitext(file)[0] for file in os.listdir(val_path_yolo) if os.path.isfile(os.path.join(val_path_yolo, file))]
-
-    # Create the new validation folder if it doesn't exist
-    os.makedirs(val_new_path, exist_ok=True)
-
-    # Iterate through train folder files
-    for filename in os.listdir(train_path):
-        basename = os.path.splitext(filename)[0]
-
-        # If the filename is in validation set
-        if basename in val_filenames:
-            # Source path of the file in train folder
-            src_path = os.path.join(train_path, filename)
-
-            # Destination path in new validation folder
-            dst_path = os.path.join(val_new_path, filename)
-
-            # Move the file
-            shutil.move(src_path, dst_path)
-            print(f"Moved {filename} to validation folder")
+import argparse
+from src.splits import (SPLITS_FILE, build_split_views, create_split_manifest, load_or_create_split_manifest,
+                        save_split_manifest)
+
+def main(source_dir, splits_path=SPLITS_FILE, view_root='data', link='hardlink', seed=None, val_fraction=None,
+         from_yolo=None, resplit=False):
+    if from_yolo is not None:
+        if os.path.exists(splits_path) and not resplit:
+            raise ValueError(f"Split manifest {splits_path} already exists. Pass --resplit to replace it.")
+        # Adopt the val split of an existing YOLO dataset, e.g. one converted before the manifest existed
+        val_names = {os.path.splitext(file)[0] for file in os.listdir(from_yolo)
+                     if os.path.isfile(os.path.join(from_yolo, file))}
+        manifest = create_split_manifest(source_dir, val_names=val_names)
+        save_split_manifest(manifest, splits_path)
+        print(f"Saved split manifest to {splits_path} with the val split of {from_yolo}")
+    else:
+        manifest = load_or_create_split_manifest(splits_path, source_dir, val_fraction, seed, resplit)
+
+    # The split folders only link to the dataset files, nothing is moved
+    build_split_views(manifest, view_root, link)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build data/{train,val,test} from the split manifest.")
+    parser.add_argument("source_dir", type=str, help="Path to the UC3M-LP dataset.")
+    parser.add_argument("--splits", type=str, default=SPLITS_FILE, help="Split manifest, created if missing.")
+    parser.add_argument("--view-root", type=str, default="data", help="Folder that gets one subfolder per split.")
+    parser.add_argument("--link", type=str, default="hardlink", choices=["hardlink", "symlink"],
+                        help="How split folders refer to the dataset files (hard links fall back to symlinks).")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed of a new train/val split (default: 0); must match an existing manifest.")
+    parser.add_argument("--val-fraction", type=float, default=None,
+                        help="Fraction of the UC3M-LP train split used for val in a new split (default: 0.2).")
+    parser.add_argument("--resplit", action="store_true",
+                        help="Replace the split manifest with a new split (or the --from-yolo one).")
+    parser.add_argument("--from-yolo", type=str, default=None,
+                        help="Take the val split from this YOLO images folder instead "
+                             "(e.g. datasets/data-yolo/LP/images/val).")
+
+    args = parser.parse_args()
+    main(args.source_dir, args.splits, args.view_root, args.link, args.seed, args.val_fraction, args.from_yolo,
+         args.resplit)
@@ -0,0 +1,52 @@
+import asyncio
+import argparse
+from ultralytics import YOLO
+from src import tracing
+from src.image_processing import DESKEW_METHODS
+from src.ocr_cache import OCRCache
+from src.server import PlateServer
+
+def main(engine, weights, host='127.0.0.1', port=8000, unix_path=None, max_batch=16, max_latency_ms=10,
+         max_queue=128, threads=None, raw=False, deskew_method='hough', cache_items=0):
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+    model = YOLO(weights)
+    cache = OCRCache(max_items=cache_items) if cache_items else None
+    server = PlateServer(model, engine=engine, processed=not raw, device='cpu', deskew_method=deskew_method,
+                         cache=cache, max_batch=max_batch, max_latency=max_latency_ms / 1000,
+                         max_queue=max_queue)
+
+    print(f"Loading detector and engine='{engine}'...")
+    server.warmup()
+    try:
+        asyncio.run(server.serve(host, port, unix_path))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve plate detection and OCR over HTTP with micro-batching, on CPU.")
+    parser.add_argument("--engine", type=str, required=True, help="OCR engine to use (e.g., 'easyocr').")
+    parser.add_argument("--weights", type=str, default="runs/detect/train/weights/best.pt", help="YOLO weights for plate detection.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    parser.add_argument("--unix", type=str, default=None, help="Listen on this unix socket instead of TCP.")
+    parser.add_argument("--max-batch", type=int, default=16, help="Maximum number of images per batch.")
+    parser.add_argument("--max-latency-ms", type=float, default=10,
+                        help="Longest a request waits for its batch to fill.")
+    parser.add_argument("--max-queue", type=int, default=128,
+                        help="Queued requests beyond which new requests get 503.")
+    parser.add_argument("--threads", type=int, default=None, help="Torch CPU threads (default: torch's choice).")
+    parser.add_argument("--cache-items", type=int, default=0, help="Keep an in-memory OCR cache of this many crops.")
+    parser.add_argument("--deskew-method", type=str, default="hough", choices=list(DESKEW_METHODS),
+                        help="Skew angle estimator used before OCR.")
+    parser.add_argument("--raw", action="store_true", help="Run OCR on raw crops, skipping deskew and thresholding.")
+    parser.add_argument("--trace", action="store_true", help="Add per-stage timings to /metrics.")
+
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable()
+    main(engine=args.engine, weights=args.weights, host=args.host, port=args.port, unix_path=args.unix,
+         max_batch=args.max_batch, max_latency_ms=args.max_latency_ms, max_queue=args.max_queue,
+         threads=args.threads, raw=args.raw, deskew_method=args.deskew_method, cache_items=args.cache_items)
@@ -0,0 +1,144 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import pandas as pd
+
+THUMBNAIL_CACHE_DIR = '.cache/thumbnails'
+
+# Size of each panel of a cell: original crop, processed crop and OCR text
+PANEL_SIZE = (160, 48)
+CELL_PADDING = 4
+BACKGROUND = (40, 40, 40)
+CORRECT_COLOR = (80, 200, 80)
+WRONG_COLOR = (80, 80, 230)
+TEXT_COLOR = (230, 230, 230)
+
+def thumbnail_key(path, size):
+    """
+    Cache key of a thumbnail: the source path, its mtime and size, and the thumbnail size.
+    """
+    stat = os.stat(path)
+    return hashlib.sha1(f'{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}:{size}'.encode()).hexdigest()
+
+def fit(image, size):
+    """
+    Downscale an image to fit in size (width, height), centred on the background colour.
+    """
+    width, height = size
+    canvas = np.full((height, width, 3), BACKGROUND, np.uint8)
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    scale = min(width / image.shape[1], height / image.shape[0])
+    w, h = max(1, int(image.shape[1] * scale)), max(1, int(image.shape[0] * scale))
+    resized = cv2.resize(image, (w, h), interpolation=cv2.INTER_AREA)
+    x, y = (width - w) // 2, (height - h) // 2
+    canvas[y:y + h, x:x + w] = resized
+    return canvas
+
+def load_thumbnail(path, size=PANEL_SIZE, cache_dir=THUMBNAIL_CACHE_DIR):
+    """
+    Thumbnail of an image file, read from the cache while the file is unchanged.
+    Returns None if the file is missing or unreadable.
+    """
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return None
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, thumbnail_key(path, size) + '.png')
+        if os.path.exists(cache_path):
+            thumbnail = cv2.imread(cache_path, cv2.IMREAD_COLOR)
+            if thumbnail is not None:
+                return thumbnail
+
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    thumbnail = fit(image, size)
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(cv2.imencode('.png', thumbnail)[1].tobytes())
+        os.replace(tmp_path, cache_path)
+    return thumbnail
+
+def load_thumbnails(paths, size=PANEL_SIZE, cache_dir=THUMBNAIL_CACHE_DIR, workers=None):
+    """
+    Thumbnails of many files, built in parallel threads (OpenCV releases the GIL).
+    """
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(lambda path: load_thumbnail(path, size, cache_dir), paths))
+
+def text_panel(filename, ocr_text, true_text, size=PANEL_SIZE):
+    """
+    Panel with the crop name and the predicted text, coloured by whether it matches
+    the true text (which is shown below it when wrong).
+    """
+    width, height = size
+    panel = np.full((height, width, 3), BACKGROUND, np.uint8)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    cv2.putText(panel, str(filename)[:28], (3, 11), font, 0.3, TEXT_COLOR, 1, cv2.LINE_AA)
+    ocr_text = '' if pd.isna(ocr_text) else str(ocr_text)
+    if pd.isna(true_text):
+        cv2.putText(panel, ocr_text or '-', (3, 30), font, 0.5, TEXT_COLOR, 1, cv2.LINE_AA)
+        return panel
+    correct = ocr_text == str(true_text)
+    cv2.putText(panel, ocr_text or '-', (3, 30), font, 0.5, CORRECT_COLOR if correct else WRONG_COLOR, 1,
+                cv2.LINE_AA)
+    if not correct:
+        cv2.putText(panel, f'true {true_text}', (3, 44), font, 0.4, TEXT_COLOR, 1, cv2.LINE_AA)
+    return panel
+
+def render_page(cells, columns, size=PANEL_SIZE):
+    """
+    Tile (original, processed, text) panel triplets into one grid image.
+    """
+    width, height = size
+    cell_w, cell_h = 3 * width + 2 * CELL_PADDING, height + CELL_PADDING
+    rows = -(-len(cells) // columns)
+    page = np.zeros((rows * cell_h + CELL_PADDING, columns * (cell_w + CELL_PADDING) + CELL_PADDING, 3), np.uint8)
+    blank = np.full((height, width, 3), BACKGROUND, np.uint8)
+    for i, panels in enumerate(cells):
+        x = CELL_PADDING + (i % columns) * (cell_w + CELL_PADDING)
+        y = CELL_PADDING + (i // columns) * cell_h
+        for j, panel in enumerate(panels):
+            x0 = x + j * (width + CELL_PADDING)
+            page[y:y + height, x0:x0 + width] = blank if panel is None else panel
+    return page
+
+def render_contact_sheets(samples, original_dir, processed_dir, output_dir, columns=4, rows=25,
+                          size=PANEL_SIZE, cache_dir=THUMBNAIL_CACHE_DIR, workers=None):
+    """
+    Write paged grids of crops to output_dir as page_000.jpg, page_001.jpg, ...
+    `samples` is a DataFrame with 'filename' and optionally 'ocr_text' and
+    'true_lp_text' columns; each row becomes an original/processed/text triplet.
+    Returns the paths of the pages.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    # Pages of an earlier, longer run would otherwise look like part of this one
+    for filename in os.listdir(output_dir):
+        if filename.startswith('page_') and filename.endswith('.jpg'):
+            os.remove(os.path.join(output_dir, filename))
+    samples = samples.reset_index(drop=True)
+    ocr_texts = samples['ocr_text'] if 'ocr_text' in samples else pd.Series([np.nan] * len(samples))
+    true_texts = samples['true_lp_text'] if 'true_lp_text' in samples else pd.Series([np.nan] * len(samples))
+    per_page = columns * rows
+
+    pages = []
+    for start in range(0, len(samples), per_page):
+        filenames = samples['filename'].iloc[start:start + per_page].tolist()
+        paths = [os.path.join(original_dir, f) for f in filenames] + [os.path.join(processed_dir, f) for f in filenames]
+        thumbnails = load_thumbnails(paths, size, cache_dir, workers)
+        originals, processed = thumbnails[:len(filenames)], thumbnails[len(filenames):]
+        texts = [text_panel(f, ocr_text, true_text, size) for f, ocr_text, true_text in
+                 zip(filenames, ocr_texts.iloc[start:start + per_page], true_texts.iloc[start:start + per_page])]
+        page_path = os.path.join(output_dir, f'page_{len(pages):03d}.jpg')
+        cv2.imwrite(page_path, render_page(list(zip(originals, processed, texts)), columns, size))
+        pages.append(page_path)
+    return pages
@@ -0,0 +1,118 @@
+import os
+import cv2
+import numpy as np
+import pandas as pd
+
+DATA_FILE = 'data.bin'
+INDEX_FILE = 'index.csv'
+# Detector boxes of the crops, written next to cropped images or inside a crop store
+BOXES_FILE = 'boxes.csv'
+
+def crop_filename(image_name, crop_idx):
+    """
+    Name of a crop, matching the files written by predict_boxes.
+    """
+    return f"{os.path.splitext(image_name)[0]}_crop_{crop_idx}.jpg"
+
+def parse_crop_filename(filename):
+    """
+    Split a crop filename into the source image name and the crop index.
+    """
+    stem, _, crop_idx = os.path.splitext(filename)[0].rpartition('_crop_')
+    if not stem:
+        return filename, 0
+    return stem + '.jpg', int(crop_idx)
+
+def crop_store_path(split, processed=False):
+    """
+    Default location of the crop store of a split, next to the cropped image folders.
+    """
+    return f"crop_store_processed/{split}" if processed else f"crop_store/{split}"
+
+def is_crop_store(path):
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+class CropStoreWriter:
+    """
+    Pack crops of one split into a single flat uint8 file with a CSV index.
+
+    Crops are resized to a fixed `height` (keeping their aspect ratio) unless
+    height is None. Use as a context manager or call close() to publish the store.
+    """
+
+    def __init__(self, path, height=64):
+        self.path = path
+        self.height = height
+        self.rows = []
+        self.offset = 0
+        os.makedirs(path, exist_ok=True)
+        self._tmp_data_path = os.path.join(path, DATA_FILE + '.tmp')
+        self._data = open(self._tmp_data_path, 'wb')
+
+    def add(self, source, crop_idx, image):
+        if image.size == 0:
+            return
+        if self.height is not None and image.shape[0] != self.height:
+            width = max(1, round(image.shape[1] * self.height / image.shape[0]))
+            image = cv2.resize(image, (width, self.height), interpolation=cv2.INTER_AREA)
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        self._data.write(image.tobytes())
+        self.rows.append({
+            'source': source,
+            'crop_idx': crop_idx,
+            'offset': self.offset,
+            'height': image.shape[0],
+            'width': image.shape[1],
+            'channels': image.shape[2] if image.ndim == 3 else 1,
+        })
+        self.offset += image.nbytes
+
+    def close(self):
+        if self._data.closed:
+            return
+        self._data.close()
+        os.replace(self._tmp_data_path, os.path.join(self.path, DATA_FILE))
+        index = pd.DataFrame(self.rows, columns=['source', 'crop_idx', 'offset', 'height', 'width', 'channels'])
+        index.to_csv(os.path.join(self.path, INDEX_FILE), index=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class CropStore:
+    """
+    Read-only, memory-mapped view of a crop store. Crops are returned as views
+    into the mapped file, without copying or decoding.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index = pd.read_csv(os.path.join(path, INDEX_FILE))
+        data_path = os.path.join(path, DATA_FILE)
+        # np.memmap cannot map an empty file
+        if os.path.getsize(data_path) > 0:
+            self.data = np.memmap(data_path, dtype=np.uint8, mode='r')
+        else:
+            self.data = np.empty(0, dtype=np.uint8)
+        self._offsets = self.index['offset'].to_numpy()
+        self._shapes = self.index[['height', 'width', 'channels']].to_numpy()
+        self.filenames = [crop_filename(source, crop_idx)
+                          for source, crop_idx in zip(self.index['source'], self.index['crop_idx'])]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        height, width, channels = self._shapes[i]
+        start = self._offsets[i]
+        crop = self.data[start:start + height * width * channels]
+        return crop.reshape((height, width) if channels == 1 else (height, width, channels))
+
+    def items(self):
+        """
+        Yield (crop filename, crop) pairs.
+        """
+        for i, filename in enumerate(self.filenames):
+            yield filename, self[i]
@@ -1,40 +1,124 @@
 import os
 import json
+import pickle
+import hashlib
 import pandas as pd
+from src import tracing
+from concurrent.futures import ProcessPoolExecutor
+
+TRUE_LABEL_COLUMNS = ['filename', 'true_lp_id', 'true_lp_text', 'poly_coord',
+                      'x_min', 'y_min', 'x_max', 'y_max']
+TRUE_LABELS_CACHE_DIR = '.cache/true_labels'
+
+def _plate_rows(json_path, data):
+    """
+    Keep only the fields needed for evaluation from a parsed annotation.
+    """
+    filename = os.path.basename(json_path).replace('.json', '.jpg')
+    rows = []
+    for lp in data.get('lps', []):
+        poly_coord = lp.get('poly_coord', [])
+        x_coords = [coord[0] for coord in poly_coord] or [0]
+        y_coords = [coord[1] for coord in poly_coord] or [0]
+        rows.append((
+            filename,
+            lp.get('lp_id', ''),
+            ''.join([char['char_id'] for char in lp.get('characters', [])]),
+            poly_coord,
+            min(x_coords), min(y_coords), max(x_coords), max(y_coords),
+        ))
+    return rows
 
 def extract_true_labels_from_json(json_path):
     """
     Extract true license plate labels from a single JSON file.
     """
-    try:
-        with open(json_path, 'r') as file:
-            data = json.load(file)
-        
-        true_labels = []
-        
-        for lp in data.get('lps', []):
-            true_labels.append({
-                'filename': os.path.basename(json_path).replace('.json', '.jpg'),
-                'true_lp_id': lp.get('lp_id', ''),
-                'true_lp_text': ''.join([char['char_id'] for char in lp.get('characters', [])])
-            })
-        
-        return true_labels
-        
-    except Exception as e:
+    rows, errors = _parse_annotations([json_path])
+    for _, e in errors:
         print(f"Error processing {json_path}: {e}")
-        return []
+    return [dict(zip(TRUE_LABEL_COLUMNS, row)) for row in rows]
+
+def _parse_annotations(json_paths):
+    """
+    Parse a chunk of annotation files. Returns the plate rows and the files that failed.
+    """
+    rows, errors = [], []
+    for json_path in json_paths:
+        try:
+            with open(json_path, 'r') as file:
+                data = json.load(file)
+            rows.extend(_plate_rows(json_path, data))
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            errors.append((json_path, e))
+    return rows, errors
+
+def _directory_key(entries):
+    """
+    Hash of the names, sizes and mtimes of the annotation files.
+    """
+    key = hashlib.sha1()
+    for entry in entries:
+        stat = entry.stat()
+        key.update(f'{entry.name}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+    return key.hexdigest()
+
+def load_true_labels(json_directory, workers=None, use_cache=True, cache_dir=TRUE_LABELS_CACHE_DIR):
+    """
+    Load the plates of all JSON annotations of a directory into a columnar DataFrame.
+
+    Files are parsed in parallel by `workers` processes (all cores by default).
+    The result is cached on disk and reused while no annotation file is added,
+    removed or modified.
+    """
+    entries = sorted((entry for entry in os.scandir(json_directory) if entry.name.endswith('.json')),
+                     key=lambda entry: entry.name)
+
+    cache_path = None
+    if use_cache:
+        directory_hash = hashlib.sha1(os.path.abspath(json_directory).encode()).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, f'{directory_hash}_{_directory_key(entries)}.pkl')
+        if os.path.exists(cache_path):
+            tracing.count('true_labels_cache_hits')
+            return pd.read_pickle(cache_path)
+
+    json_paths = [entry.path for entry in entries]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(json_paths) < 256:
+        results = [_parse_annotations(json_paths)]
+    else:
+        chunk_size = max(64, len(json_paths) // (workers * 4))
+        chunks = [json_paths[i:i + chunk_size] for i in range(0, len(json_paths), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_parse_annotations, chunks))
+
+    rows = [row for chunk_rows, _ in results for row in chunk_rows]
+    errors = [error for _, chunk_errors in results for error in chunk_errors]
+    for json_path, e in errors:
+        print(f"Error processing {json_path}: {e}")
+
+    true_labels = pd.DataFrame(rows, columns=TRUE_LABEL_COLUMNS)
+    true_labels['filename'] = true_labels['filename'].astype('category')
+    true_labels['true_lp_id'] = true_labels['true_lp_id'].astype('category')
+    for column in ['x_min', 'y_min', 'x_max', 'y_max']:
+        true_labels[column] = pd.to_numeric(true_labels[column], downcast='integer')
+
+    if cache_path is not None and not errors:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Drop caches of earlier versions of the same directory
+        for name in os.listdir(cache_dir):
+            if name.startswith(directory_hash + '_'):
+                os.remove(os.path.join(cache_dir, name))
+        tmp_path = cache_path + '.tmp'
+        true_labels.to_pickle(tmp_path, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    return true_labels
 
 def batch_extract_true_labels(json_directory):
     """
     Extract true labels from all JSON files in a directory.
     """
-    all_true_labels = []
-    
-    for filename in os.listdir(json_directory):
-        if filename.endswith('.json'):
-            json_path = os.path.join(json_directory, filename)
-            labels = extract_true_labels_from_json(json_path)
-            all_true_labels.extend(labels)
-        
-    return pd.DataFrame(all_true_labels)
+    with tracing.span('load_true_labels'):
+        true_labels = load_true_labels(json_directory)
+    tracing.count('true_plates', len(true_labels))
+    return true_labels
@@ -0,0 +1,162 @@
+import os
+import time
+import cv2
+import numpy as np
+import pandas as pd
+from src.image_processing import IMAGE_EXTENSIONS
+
+CALIBRATION_DIR = 'datasets/data-yolo/LP/images/val'
+
+# The LP detector is trained and run at 320 (see predict_boxes)
+DEFAULT_IMGSZ = 320
+
+def letterbox(image, size=DEFAULT_IMGSZ, color=(114, 114, 114)):
+    """
+    Resize keeping the aspect ratio and pad to a size x size square, like the YOLO loader.
+    """
+    h, w = image.shape[:2]
+    scale = size / max(h, w)
+    resized = cv2.resize(image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_LINEAR)
+    top = (size - resized.shape[0]) // 2
+    left = (size - resized.shape[1]) // 2
+    return cv2.copyMakeBorder(resized, top, size - resized.shape[0] - top, left, size - resized.shape[1] - left,
+                              cv2.BORDER_CONSTANT, value=color)
+
+def to_input_tensor(image, size=DEFAULT_IMGSZ):
+    """
+    BGR image -> (1, 3, size, size) float32 RGB tensor in [0, 1].
+    """
+    image = letterbox(image, size)[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+
+def calibration_images(image_dir=CALIBRATION_DIR, limit=300):
+    """
+    Evenly spaced sample of up to `limit` image paths of the val split.
+    """
+    paths = sorted(os.path.join(image_dir, f) for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if len(paths) > limit:
+        paths = [paths[i] for i in np.linspace(0, len(paths) - 1, limit).astype(int)]
+    return paths
+
+def train_imgsz(weights):
+    """
+    Image size the YOLO weights were trained at, or DEFAULT_IMGSZ if unknown.
+    """
+    from ultralytics import YOLO
+
+    imgsz = YOLO(weights).overrides.get('imgsz') or DEFAULT_IMGSZ
+    return imgsz[0] if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+def quantize_onnx(model_path, output_path=None, image_dir=CALIBRATION_DIR, imgsz=None, limit=300):
+    """
+    Statically quantize an exported ONNX detector to INT8 with ONNX Runtime,
+    calibrating activations on val split images. Calibration images are sized to
+    the model input unless imgsz is given. Returns the output path.
+    """
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    output_path = output_path or os.path.splitext(model_path)[0] + '_int8.onnx'
+    model_input = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider']).get_inputs()[0]
+    input_name = model_input.name
+    if imgsz is None:
+        # Exported detectors have a fixed (1, 3, imgsz, imgsz) input
+        height = model_input.shape[2]
+        imgsz = height if isinstance(height, int) else DEFAULT_IMGSZ
+    paths = calibration_images(image_dir, limit)
+
+    class ValReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(path)
+                if image is not None:
+                    return {input_name: to_input_tensor(image, imgsz)}
+            return None
+
+    print(f"Calibrating INT8 quantization on {len(paths)} images from {image_dir}...")
+    quantize_static(model_path, output_path, ValReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+
+    # Ultralytics reads class names, stride and image size from the model metadata
+    original, quantized = onnx.load(model_path), onnx.load(output_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(original.metadata_props)
+    onnx.save(quantized, output_path)
+    return output_path
+
+def export_detector(weights, formats=('onnx',), int8=False, data='cfg.yaml', imgsz=None, limit=300):
+    """
+    Export trained YOLO weights for CPU inference. Returns {name: path} of the
+    exported models, including the INT8 variants when int8 is set: ONNX models are
+    quantized with ONNX Runtime and OpenVINO models with NNCF, both calibrated on val.
+    The input size defaults to the one the weights were trained at.
+    """
+    from ultralytics import YOLO
+
+    imgsz = imgsz or train_imgsz(weights)
+    exported = {}
+    for fmt in formats:
+        model = YOLO(weights)
+        if fmt == 'onnx':
+            path = model.export(format='onnx', imgsz=imgsz, device='cpu')
+            exported['onnx'] = path
+            if int8:
+                exported['onnx_int8'] = quantize_onnx(path, imgsz=imgsz, limit=limit)
+        elif fmt == 'openvino':
+            exported['openvino'] = model.export(format='openvino', imgsz=imgsz, device='cpu')
+            if int8:
+                # The int8 export is calibrated on the val split of `data`
+                exported['openvino_int8'] = YOLO(weights).export(format='openvino', imgsz=imgsz, int8=True,
+                                                                 data=data, device='cpu')
+        else:
+            raise ValueError(f"Unsupported export format '{fmt}'. Expected 'onnx' or 'openvino'.")
+    return exported
+
+def _size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 2**20
+    return os.path.getsize(path) / 2**20
+
+def compare_detectors(models, data='cfg.yaml', imgsz=None, device='cpu', speed_images=100):
+    """
+    Validate each model ({name: path}) on the val split and time single-image
+    inference on CPU. Returns one row per model with mAP50, mAP50-95 and images/s.
+    All models run at imgsz, by default the train size of the PyTorch weights.
+    """
+    from ultralytics import YOLO
+
+    if imgsz is None:
+        weights = [path for path in models.values() if str(path).endswith('.pt')]
+        imgsz = train_imgsz(weights[0]) if weights else DEFAULT_IMGSZ
+
+    images = [cv2.imread(path) for path in calibration_images(limit=speed_images)]
+    rows = []
+    for name, path in models.items():
+        model = YOLO(path, task='detect')
+        metrics = model.val(data=data, split='val', imgsz=imgsz, batch=1, device=device, verbose=False)
+
+        # End-to-end time per image, including pre- and postprocessing
+        model.predict(images[0], imgsz=imgsz, device=device, verbose=False)
+        start = time.perf_counter()
+        for image in images:
+            model.predict(image, imgsz=imgsz, device=device, verbose=False)
+        seconds = time.perf_counter() - start
+
+        rows.append({
+            'model': name,
+            'path': str(path),
+            'size_mb': round(_size_mb(path), 2),
+            'map50': float(metrics.box.map50),
+            'map50_95': float(metrics.box.map),
+            'images_per_s': len(images) / seconds,
+        })
+    report = pd.DataFrame(rows)
+    if len(report) and 'pytorch' in models:
+        reference = report.set_index('model').loc['pytorch']
+        report['speedup'] = report['images_per_s'] / reference['images_per_s']
+        report['map50_95_delta'] = report['map50_95'] - reference['map50_95']
+    return report
@@ -0,0 +1,211 @@
+import os
+import numpy as np
+import pandas as pd
+from src.crop_store import BOXES_FILE, parse_crop_filename
+
+BOX_COLUMNS = ['x_min', 'y_min', 'x_max', 'y_max']
+
+def attach_boxes(pred_labels, crop_dir):
+    """
+    Add the detector boxes saved next to the crops (boxes.csv) to the predictions, if present.
+    """
+    boxes_path = os.path.join(crop_dir, BOXES_FILE)
+    if not os.path.exists(boxes_path):
+        return pred_labels
+    boxes = pd.read_csv(boxes_path)
+    return pred_labels.merge(boxes[['filename'] + BOX_COLUMNS], on='filename', how='left')
+
+def encode_strings(strings, alphabet):
+    """
+    Encode strings as a zero-padded (N, max_len) int array, with codes 1..len(alphabet).
+    Returns the codes and the string lengths.
+    """
+    lengths = np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+    codes = np.zeros((len(strings), max(1, lengths.max(initial=0))), dtype=np.int32)
+    lookup = {char: i + 1 for i, char in enumerate(alphabet)}
+    for row, s in enumerate(strings):
+        codes[row, :len(s)] = [lookup[char] for char in s]
+    return codes, lengths
+
+def _edit_distance_matrices(a, b):
+    """
+    Levenshtein DP tables for a batch of encoded string pairs, shape (N, La + 1, Lb + 1).
+    Each step works on all pairs at once, so the cost is O(La * Lb) numpy operations.
+    """
+    n, la = a.shape
+    lb = b.shape[1]
+    D = np.zeros((n, la + 1, lb + 1), dtype=np.int32)
+    D[:, :, 0] = np.arange(la + 1)
+    D[:, 0, :] = np.arange(lb + 1)
+    for i in range(1, la + 1):
+        substitution = D[:, i - 1, :-1] + (a[:, i - 1:i] != b)
+        deletion = D[:, i - 1, 1:] + 1
+        row = np.minimum(substitution, deletion)
+        # Insertions depend on the left neighbour in the same row
+        D[:, i, 1:] = row
+        for j in range(1, lb + 1):
+            D[:, i, j] = np.minimum(D[:, i, j], D[:, i, j - 1] + 1)
+    return D
+
+def edit_distance(pred_texts, true_texts, chunk_size=65536):
+    """
+    Levenshtein distance between each pair of strings, computed in vectorized chunks.
+    """
+    pred_texts = [str(s) for s in pred_texts]
+    true_texts = [str(s) for s in true_texts]
+    alphabet = sorted(set(''.join(pred_texts)) | set(''.join(true_texts)))
+    distances = np.empty(len(pred_texts), dtype=np.int64)
+    for start in range(0, len(pred_texts), chunk_size):
+        stop = start + chunk_size
+        a, la = encode_strings(true_texts[start:stop], alphabet)
+        b, lb = encode_strings(pred_texts[start:stop], alphabet)
+        D = _edit_distance_matrices(a, b)
+        distances[start:stop] = D[np.arange(len(a)), la, lb]
+    return distances
+
+def character_confusion(pred_texts, true_texts):
+    """
+    Count aligned (true, predicted) character pairs over all string pairs. The empty
+    string marks insertions (true '') and deletions (predicted '').
+    """
+    pred_texts = [str(s) for s in pred_texts]
+    true_texts = [str(s) for s in true_texts]
+    alphabet = sorted(set(''.join(pred_texts)) | set(''.join(true_texts)))
+    labels = [''] + alphabet
+    confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    if not pred_texts:
+        return pd.DataFrame(confusion, index=labels, columns=labels)
+
+    a, la = encode_strings(true_texts, alphabet)
+    b, lb = encode_strings(pred_texts, alphabet)
+    D = _edit_distance_matrices(a, b)
+
+    # Walk all alignments back from the end at once
+    rows = np.arange(len(a))
+    i, j = la.copy(), lb.copy()
+    while True:
+        active = (i > 0) | (j > 0)
+        if not active.any():
+            break
+        r, ii, jj = rows[active], i[active], j[active]
+        current = D[r, ii, jj]
+        true_char = a[r, np.maximum(ii - 1, 0)]
+        pred_char = b[r, np.maximum(jj - 1, 0)]
+        diagonal = (ii > 0) & (jj > 0) & (current == D[r, np.maximum(ii - 1, 0), np.maximum(jj - 1, 0)]
+                                          + (true_char != pred_char))
+        deletion = ~diagonal & (ii > 0) & (current == D[r, np.maximum(ii - 1, 0), jj] + 1)
+        insertion = ~diagonal & ~deletion
+
+        np.add.at(confusion, (np.where(insertion, 0, true_char), np.where(deletion, 0, pred_char)), 1)
+        i[active] = ii - (diagonal | deletion)
+        j[active] = jj - (diagonal | insertion)
+
+    return pd.DataFrame(confusion, index=labels, columns=labels)
+
+def box_iou(boxes_a, boxes_b):
+    """
+    IoU of row-aligned (N, 4) xyxy box arrays.
+    """
+    x_min = np.maximum(boxes_a[:, 0], boxes_b[:, 0])
+    y_min = np.maximum(boxes_a[:, 1], boxes_b[:, 1])
+    x_max = np.minimum(boxes_a[:, 2], boxes_b[:, 2])
+    y_max = np.minimum(boxes_a[:, 3], boxes_b[:, 3])
+    intersection = np.clip(x_max - x_min, 0, None) * np.clip(y_max - y_min, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a + area_b - intersection
+    return np.where(union > 0, intersection / np.where(union > 0, union, 1), 0.0)
+
+def _greedy_one_to_one(candidates):
+    """
+    Keep the best-scoring candidate pairs such that every prediction and every true
+    plate is used at most once. Mutually best pairs are accepted in rounds.
+    """
+    accepted = []
+    candidates = candidates.sort_values('score', ascending=False, kind='stable')
+    while len(candidates):
+        best_for_pred = ~candidates.duplicated('pred_id')
+        best_for_true = ~candidates.duplicated('true_id')
+        mutual = candidates[best_for_pred & best_for_true]
+        accepted.append(mutual)
+        candidates = candidates[~candidates['pred_id'].isin(mutual['pred_id'])
+                                & ~candidates['true_id'].isin(mutual['true_id'])]
+    return pd.concat(accepted) if accepted else candidates
+
+def match_plates(pred_labels, true_labels, iou_threshold=0.5):
+    """
+    Match predicted crops to true plates of the same image, one to one.
+
+    With box columns on the predictions, pairs are scored by IoU against the true
+    plate bbox and must reach iou_threshold. Without boxes, pairs within an image
+    are matched by lowest edit distance instead.
+    Returns one row per prediction and per unmatched true plate.
+    """
+    pred = pred_labels.reset_index(drop=True).copy()
+    pred['pred_id'] = np.arange(len(pred))
+    pred['source'] = [parse_crop_filename(name)[0] for name in pred['filename']]
+    true = true_labels.reset_index(drop=True).copy()
+    true['true_id'] = np.arange(len(true))
+    true['source'] = true['filename'].astype(str)
+
+    use_boxes = all(column in pred.columns for column in BOX_COLUMNS)
+    pred_columns = ['pred_id', 'source', 'ocr_text'] + (BOX_COLUMNS if use_boxes else [])
+    true_columns = ['true_id', 'source', 'true_lp_text'] + BOX_COLUMNS
+    # Candidate pairs only exist within an image, so this join is linear in practice
+    candidates = pred[pred_columns].merge(true[true_columns], on='source', suffixes=('', '_true'))
+
+    if use_boxes:
+        candidates['iou'] = box_iou(candidates[BOX_COLUMNS].to_numpy(dtype=np.float64),
+                                    candidates[[c + '_true' for c in BOX_COLUMNS]].to_numpy(dtype=np.float64))
+        candidates = candidates[candidates['iou'] >= iou_threshold]
+        candidates = candidates.assign(score=candidates['iou'])
+    else:
+        candidates = candidates.assign(
+            iou=np.nan, score=-edit_distance(candidates['ocr_text'], candidates['true_lp_text']))
+
+    matches = _greedy_one_to_one(candidates[['pred_id', 'true_id', 'iou', 'score']])
+
+    result = pred[['pred_id', 'filename', 'source', 'ocr_text']].merge(
+        matches[['pred_id', 'true_id', 'iou']], on='pred_id', how='left')
+    result = result.merge(true[['true_id', 'true_lp_text']], on='true_id', how='outer')
+    result['true_id'] = result['true_id'].astype('Int64')
+    result['pred_id'] = result['pred_id'].astype('Int64')
+    return result
+
+def evaluate(pred_labels, true_labels, iou_threshold=0.5):
+    """
+    Score OCR predictions against ground truth.
+
+    Returns a dict with:
+      - 'metrics': accuracy (exactly read true plates / true plates), precision
+        (exact reads / predictions), cer (edit distance / true characters, with
+        missed plates counted as fully deleted) and matched_cer (matched pairs only)
+      - 'matches': the one-to-one matching with per-pair edit distance
+      - 'confusion': character confusion counts over matched pairs
+    """
+    matches = match_plates(pred_labels, true_labels, iou_threshold)
+    pred_text = matches['ocr_text'].fillna('').astype(str)
+    true_text = matches['true_lp_text'].fillna('').astype(str)
+    matched = matches['pred_id'].notna() & matches['true_id'].notna()
+
+    matches['edit_distance'] = edit_distance(pred_text, true_text)
+    matches['correct'] = matched & (pred_text == true_text)
+
+    has_true = matches['true_id'].notna()
+    true_chars = true_text[has_true].str.len().sum()
+    matched_chars = true_text[matched].str.len().sum()
+    n_true = int(has_true.sum())
+    n_pred = int(matches['pred_id'].notna().sum())
+    n_correct = int(matches['correct'].sum())
+
+    metrics = {
+        'n_pred': n_pred,
+        'n_true': n_true,
+        'n_matched': int(matched.sum()),
+        'accuracy': n_correct / n_true if n_true else 0.0,
+        'precision': n_correct / n_pred if n_pred else 0.0,
+        'cer': float(matches.loc[has_true, 'edit_distance'].sum() / true_chars) if true_chars else 0.0,
+        'matched_cer': float(matches.loc[matched, 'edit_distance'].sum() / matched_chars) if matched_chars else 0.0,
+    }
+    confusion = character_confusion(pred_text[matched].tolist(), true_text[matched].tolist())
+    return {'metrics': metrics, 'matches': matches, 'confusion': confusion}
@@ -1,18 +1,44 @@
 import os
+import time
 import cv2
 import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from src import tracing
+from src.crop_store import CropStore, CropStoreWriter, parse_crop_filename
 
-def deskew_image(image_path, output_path):
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff')
+
+@contextmanager
+def _stage(timings, name):
     """
-    Deskew a single image and save the result.
+    Add the wall time of the block to timings[name], if timings is a dict.
     """
-    image = cv2.imread(image_path)
-    if image is None:
-        print(f"Could not read image: {image_path}")
+    if timings is None:
+        yield
         return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
 
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
+def _text_mask(gray):
+    """
+    Binary mask of the dark plate characters, with border-touching blobs removed.
+    """
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    h, w = binary.shape
+    x, y, bw, bh = stats[:, 0], stats[:, 1], stats[:, 2], stats[:, 3]
+    touches_border = (x == 0) | (y == 0) | (x + bw >= w) | (y + bh >= h)
+    touches_border[0] = True  # background label
+    return np.where(touches_border[labels], 0, 255).astype(np.uint8)
+
+def _hough_lines_angles(gray):
+    """
+    Angles in degrees of the Hough lines of the plate, 0 meaning horizontal.
+    """
     # Threshold the image
     _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
     
@@ -21,65 +47,244 @@ def deskew_image(image_path, output_path):
     
     # Detect lines with Hough Transform
     lines = cv2.HoughLines(edges, 1, np.pi / 360, 100)
-    
-    # Calculate angles of the lines
-    angles = []
-    if lines is not None:
-        for line in lines:
-            rho, theta = line[0]
-            angle = np.degrees(theta) - 90
-            angles.append(angle)
-    
-    # Use the median angle as the skew angle
-    if len(angles) > 0:
-        median_angle = np.median(angles)
-    else:
-        median_angle = 0  # If no lines are detected, assume no skew
-    
-    # Rotate the image to correct skew
+    if lines is None:
+        return np.empty(0)
+    return np.degrees(lines[:, 0, 1]) - 90
+
+def _hough_angle(gray):
+    angles = _hough_lines_angles(gray)
+    # Use the median angle as the skew angle; if no lines are detected, assume no skew
+    return float(np.median(angles)) if angles.size else 0.0
+
+def _hough_hist_angle(gray, max_angle=45, bin_width=0.5):
+    angles = _hough_lines_angles(gray)
+    # Ignore near-vertical character strokes and take the most frequent line angle
+    angles = angles[np.abs(angles) <= max_angle]
+    if not angles.size:
+        return 0.0
+    bins = np.round((angles + max_angle) / bin_width).astype(int)
+    mode = np.argmax(np.bincount(bins))
+    # Refine with the mean of the angles in and around the most populated bin
+    return float(np.mean(angles[np.abs(bins - mode) <= 1]))
+
+def _min_area_rect_angle(gray):
+    points = cv2.findNonZero(_text_mask(gray))
+    if points is None or len(points) < 5:
+        return 0.0
+    box = cv2.boxPoints(cv2.minAreaRect(points))
+    # The angle of the longest side of the rectangle is the text line angle
+    edges = np.roll(box, -1, axis=0) - box
+    dx, dy = edges[np.argmax(np.hypot(edges[:, 0], edges[:, 1]))]
+    if dx < 0:
+        dx, dy = -dx, -dy
+    angle = float(np.degrees(np.arctan2(dy, dx)))
+    return angle if abs(angle) <= 45 else 0.0
+
+def _projection_angle(gray, max_angle=15.0, coarse_step=1.5, fine_step=0.25, max_width=200):
+    mask = _text_mask(gray)
+    if not mask.any():
+        return 0.0
+    # Score angles on a downscaled mask; the sharpest row profile marks the text line angle
+    scale = min(1.0, max_width / mask.shape[1])
+    if scale < 1.0:
+        mask = cv2.resize(mask, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    h, w = mask.shape
+    center = (w / 2, h / 2)
+
+    def score(angle):
+        M = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rows = cv2.warpAffine(mask, M, (w, h), flags=cv2.INTER_NEAREST).sum(axis=1, dtype=np.float64)
+        return np.sum(np.diff(rows) ** 2)
+
+    def search(angles):
+        return angles[int(np.argmax([score(a) for a in angles]))]
+
+    best = search(np.arange(-max_angle, max_angle + coarse_step / 2, coarse_step))
+    best = search(np.arange(best - coarse_step, best + coarse_step + fine_step / 2, fine_step))
+    return float(best)
+
+# Skew angle estimators, all returning the angle that rotate() needs to deskew the image
+DESKEW_METHODS = {
+    'hough': _hough_angle,
+    'hough_hist': _hough_hist_angle,
+    'min_area_rect': _min_area_rect_angle,
+    'projection': _projection_angle,
+}
+
+def estimate_skew_angle(image, method='hough'):
+    """
+    Estimate the skew angle of an image in degrees.
+    """
+    if method not in DESKEW_METHODS:
+        raise ValueError(f"Unknown deskew method '{method}'. Expected one of {sorted(DESKEW_METHODS)}.")
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return DESKEW_METHODS[method](gray)
+
+def rotate(image, angle):
+    """
+    Rotate an image around its center, replicating the border.
+    """
     (h, w) = image.shape[:2]
     center = (w // 2, h // 2)
-    M = cv2.getRotationMatrix2D(center, median_angle, 1.0)
-    rotated = cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    return cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+def deskew(image, timings=None, method='hough'):
+    """
+    Estimate the skew of an image and return the rotated image.
+    """
+    with _stage(timings, 'skew_angle'):
+        angle = estimate_skew_angle(image, method)
+    with _stage(timings, 'warp_affine'):
+        return rotate(image, angle)
+
+def binarize(image):
+    """
+    Enhance and threshold a deskewed image.
+    """
+    # Convert to grayscale
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     
-    # Save the result
-    cv2.imwrite(output_path, rotated)
-    print(f"Deskewed image saved: {output_path}")
+    # Resize image
+    gray = cv2.resize(gray, None, fx=1.2, fy=1.2, interpolation=cv2.INTER_CUBIC)
+    # Apply dilation and erosion
+    kernel = np.ones((1, 1), np.uint8)
+    gray = cv2.dilate(gray, kernel, iterations=1)
+    gray = cv2.erode(gray, kernel, iterations=1)
+    # Apply median blur and thresholding
+    gray = cv2.medianBlur(gray, 3)
+    _, gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return gray
+
+def preprocess_crop(image, timings=None, deskew_method='hough'):
+    """
+    Deskew, enhance and threshold a single crop in memory.
+    """
+    rotated = deskew(image, timings, deskew_method)
+    with _stage(timings, 'otsu'):
+        return binarize(rotated)
+
+def deskew_image(image_path, output_path, method='hough'):
+    """
+    Deskew a single image and save the result.
+    """
+    with tracing.span('deskew', key=os.path.basename(image_path)):
+        image = cv2.imread(image_path)
+        if image is None:
+            print(f"Could not read image: {image_path}")
+            return
 
-def process_images(input_dir, output_dir):
+        rotated = deskew(image, method=method)
+        
+        # Save the result
+        cv2.imwrite(output_path, rotated)
+
+def _process_file(input_path, output_path=None, deskew_method='hough'):
+    """
+    Read, preprocess and optionally write one image. Returns the processed image
+    (None if it could not be read) and the time spent in each stage.
+    """
+    # Stages are always timed here; the caller decides whether to keep them
+    timings = {}
+    with _stage(timings, 'read'):
+        image = cv2.imread(input_path)
+    if image is None:
+        print(f"Could not read image: {input_path}")
+        return None, timings
+
+    processed = preprocess_crop(image, timings, deskew_method)
+
+    if output_path is not None:
+        with _stage(timings, 'write'):
+            cv2.imwrite(output_path, processed)
+    return processed, timings
+
+def _add_timings(timings, item_timings, key):
+    """
+    Accumulate the stage timings of one item and forward them to the tracer.
+    """
+    for stage, seconds in item_timings.items():
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+        tracing.record(stage, seconds, key=key)
+    tracing.count('preprocessed_images')
+
+def process_images(input_dir, output_dir=None, workers=1, executor='thread',
+                   return_arrays=False, timings=None, deskew_method='hough',
+                   store_path=None, store_height=64):
     """
     Process images by deskewing, enhancing, and thresholding.
+
+    Images are processed by `workers` threads (OpenCV releases the GIL) or processes.
+    Results are written once to output_dir if it is given, and returned as a
+    {filename: array} dict if return_arrays is set. If timings is a dict, the total
+    time spent per stage (read, skew_angle, warp_affine, otsu, write) is added to it.
+    `deskew_method` selects the skew estimator, see DESKEW_METHODS. If store_path
+    is set, the results are also packed into a crop store.
+    """
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    filenames = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    input_paths = [os.path.join(input_dir, f) for f in filenames]
+    output_paths = [os.path.join(output_dir, f) if output_dir is not None else None for f in filenames]
+    methods = [deskew_method] * len(filenames)
+
+    if workers <= 1:
+        results = map(_process_file, input_paths, output_paths, methods)
+        pool = None
+    else:
+        pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+        pool = pool_class(max_workers=workers)
+        results = pool.map(_process_file, input_paths, output_paths, methods,
+                           chunksize=max(1, len(filenames) // (workers * 16)))
+
+    arrays = {}
+    store = CropStoreWriter(store_path, height=store_height) if store_path is not None else None
+    try:
+        for filename, (processed, file_timings) in zip(filenames, results):
+            if return_arrays and processed is not None:
+                arrays[filename] = processed
+            if store is not None and processed is not None:
+                store.add(*parse_crop_filename(filename), processed)
+            _add_timings(timings, file_timings, filename)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if store is not None:
+            store.close()
+
+    print(f"Processed {len(filenames)} images from {input_dir}")
+    return arrays if return_arrays else None
+
+def _preprocess_timed(image, deskew_method):
+    timings = {}
+    return preprocess_crop(image, timings, deskew_method), timings
+
+def process_crop_store(input_path, output_path, workers=1, timings=None, deskew_method='hough',
+                       store_height=64):
+    """
+    Preprocess every crop of a crop store into a new crop store, without any JPEG decoding.
     """
-    os.makedirs(output_dir, exist_ok=True)
-
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff')):
-            # Paths for input and output images
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, filename)
-            print(f"Processing {filename}...")
-            
-            # Deskew the image
-            deskew_image(input_path, output_path)
-            
-            # Read the deskewed image for further processing
-            img = cv2.imread(output_path)
-            if img is not None:
-                # Convert to grayscale
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                
-                # Resize image
-                gray = cv2.resize(gray, None, fx=1.2, fy=1.2, interpolation=cv2.INTER_CUBIC)
-                # Apply dilation and erosion
-                kernel = np.ones((1, 1), np.uint8)
-                gray = cv2.dilate(gray, kernel, iterations=1)
-                gray = cv2.erode(gray, kernel, iterations=1)
-                # Apply median blur and thresholding
-                gray = cv2.medianBlur(gray, 3)
-                _, gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                
-                # Save the processed image
-                cv2.imwrite(output_path, gray)
-                print(f"Processed and saved: {output_path}")
-            else:
-                print(f"Could not read deskewed image: {output_path}")
+    crops = CropStore(input_path)
+    images = (crops[i] for i in range(len(crops)))
+    methods = [deskew_method] * len(crops)
+
+    if workers <= 1:
+        results = map(_preprocess_timed, images, methods)
+        pool = None
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        results = pool.map(_preprocess_timed, images, methods)
+
+    try:
+        with CropStoreWriter(output_path, height=store_height) as store:
+            for (source, crop_idx), (processed, crop_timings) in zip(
+                    zip(crops.index['source'], crops.index['crop_idx']), results):
+                store.add(source, crop_idx, processed)
+                _add_timings(timings, crop_timings, f'{source}#{crop_idx}')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print(f"Processed {len(crops)} crops from {input_path}")
@@ -1,57 +1,297 @@
-from PIL import Image
 import os
+import queue
+import threading
+import cv2
+import numpy as np
+import pandas as pd
+from src import tracing
+from src.crop_store import BOXES_FILE, CropStoreWriter, crop_filename
+from src.image_processing import IMAGE_EXTENSIONS
+from src.ocr_engines import iter_batches
+from src.refine import COARSE_CONF, refine_boxes
+from src.splits import split_members
 
-def predict_boxes(model, split, get_cropped_images=True):
+def select_device(device=None):
     """
-    Predict bounding boxes using the YOLO model and optionally crop the images.
+    Return the device to run the detector on: `device` if given, otherwise CUDA,
+    then Apple MPS, then CPU, whichever is available first.
+    """
+    if device not in (None, 'auto'):
+        return device
+    import torch
+    if torch.cuda.is_available():
+        return 'cuda:0'
+    if getattr(torch.backends, 'mps', None) is not None and torch.backends.mps.is_available():
+        return 'mps'
+    return 'cpu'
+
+def _to_numpy(values):
+    """
+    Convert a tensor (or anything array-like) to a numpy array.
+    """
+    if hasattr(values, 'cpu'):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+def rescale_boxes(boxes, scale_x, scale_y, image_shape=None, pad=0.0, clamp=True):
+    """
+    Rescale xyxy boxes to original image coordinates in one vectorized step.
+    `pad` grows each box by that fraction of its width/height on every side and
+    `clamp` keeps the boxes inside an image of shape `image_shape`.
+    Returns an (N, 4) integer array.
+    """
+    boxes = _to_numpy(boxes)[:, :4].astype(np.float64) * np.array([scale_x, scale_y, scale_x, scale_y])
+
+    if pad:
+        size = boxes[:, 2:] - boxes[:, :2]
+        boxes = boxes + np.hstack([-size, size]) * pad
+
+    if clamp and image_shape is not None:
+        h, w = image_shape[:2]
+        boxes = np.clip(boxes, 0, [w, h, w, h])
+
+    return boxes.astype(int)
+
+def crop_boxes(image, boxes):
+    """
+    Cut one view of the image per integer xyxy box.
+    """
+    return [image[y_min:y_max, x_min:x_max] for x_min, y_min, x_max, y_max in boxes]
+
+def prediction_crops(pred, original_image, pad=0.0, clamp=True):
+    """
+    Map the boxes of a prediction made on a downscaled image to the original image
+    and return the boxes and their crops.
+    """
+    # The detector input size is known from the prediction, so only the original is decoded
+    H_down, W_down = pred.orig_shape[:2]
+    H_orig, W_orig = original_image.shape[:2]
+    boxes = rescale_boxes(pred.boxes.xyxy, W_orig / W_down, H_orig / H_down,
+                          image_shape=original_image.shape, pad=pad, clamp=clamp)
+    return boxes, crop_boxes(original_image, boxes)
+
+def iter_image_batches(paths, batch_size=16, prefetch=2):
+    """
+    Yield lists of (path, image) decoded by a background thread, which stays at most
+    `prefetch` batches ahead of the consumer. Unreadable images have image None.
+    """
+    batches = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for batch in iter_batches(paths, batch_size):
+                if not put([(path, cv2.imread(path)) for path in batch]):
+                    return
+        except Exception as e:
+            # Raised again in the consumer, which would otherwise wait for the sentinel forever
+            put(e)
+            return
+        put(None)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        # Also stops the reader when the consumer quits early
+        stop.set()
+        reader.join()
+
+def iter_detections(model, split, batch_size=16, prefetch=2, device=None, conf=None, members=None):
+    """
+    Stream (image_name, prediction) pairs for the downscaled images of a split.
+    Images are detected batch_size at a time while the next `prefetch` batches are
+    decoded, and predictions are moved to the CPU without their input image, so
+    memory does not grow with the number of images. `conf` overrides the detector's
+    confidence threshold. With `members` (a set of image names without extension),
+    only those images are detected.
     """
     valid_splits = {'train', 'val', 'test'}
     if split not in valid_splits:
         raise ValueError(f"Invalid split '{split}'. Expected one of {valid_splits}.")
 
-    preds = model.predict(source=f"datasets/data-yolo/LP/images/{split}", device="mps")
+    image_dir = f"datasets/data-yolo/LP/images/{split}"
+    paths = [os.path.join(image_dir, f) for f in sorted(os.listdir(image_dir)) if f.lower().endswith(IMAGE_EXTENSIONS)
+             and (members is None or os.path.splitext(f)[0] in members)]
+    device = select_device(device)
+    options = {} if conf is None else {'conf': conf}
+
+    for batch in iter_image_batches(paths, batch_size, prefetch):
+        readable = []
+        for path, image in batch:
+            if image is None:
+                print(f"Could not read image: {path}")
+                tracing.count('unreadable_images')
+            else:
+                readable.append((path, image))
+        if not readable:
+            continue
 
+        with tracing.span('detect'):
+            preds = model.predict([image for _, image in readable], device=device, verbose=False, **options)
+        tracing.count('images', len(preds))
+        for (path, _), pred in zip(readable, preds):
+            pred = pred.cpu()
+            # Only the shape of the detector input is needed to rescale the boxes
+            pred.orig_img = None
+            yield os.path.basename(path), pred
+
+def _refine_options(refine):
+    """
+    None when refinement is off, otherwise the refine_boxes options.
+    """
+    if refine is None or refine is False:
+        return None
+    return refine if isinstance(refine, dict) else {}
+
+def detection_crops(model, pred, original_image, pad=0.0, clamp=True, refine=None, device=None):
+    """
+    Boxes, confidences and crops of a prediction in original image coordinates.
+    With refine (True or a dict of refine_boxes options), the coarse boxes are
+    refined on the full-resolution image first.
+    """
+    confidences = _to_numpy(pred.boxes.conf)
+    options = _refine_options(refine)
+    if options is None:
+        boxes, crops = prediction_crops(pred, original_image, pad=pad, clamp=clamp)
+        return boxes, confidences, crops
+
+    H_down, W_down = pred.orig_shape[:2]
+    H_orig, W_orig = original_image.shape[:2]
+    boxes = rescale_boxes(pred.boxes.xyxy, W_orig / W_down, H_orig / H_down, image_shape=original_image.shape)
+    boxes, confidences = refine_boxes(model, original_image, boxes, confidences, device=select_device(device),
+                                      **options)
+    # Padding is applied to the final boxes only
+    boxes = rescale_boxes(boxes, 1, 1, image_shape=original_image.shape, pad=pad, clamp=clamp)
+    return boxes, confidences, crop_boxes(original_image, boxes)
+
+def predict_boxes(model, split, get_cropped_images=True, pad=0.0, clamp=True,
+                  store_path=None, store_height=64, device=None, batch_size=16, prefetch=2,
+                  keep_preds=True, refine=None, splits=None, output_dir=None):
+    """
+    Predict bounding boxes using the YOLO model and optionally crop the images.
+    Crops are written to output_dir (default: cropped_images/{split}).
+    If store_path is set, crops are packed into a crop store instead of JPEG files.
+    The device is picked by select_device unless given. Images are detected in
+    batches and cropped as soon as they are detected (see iter_detections).
+    With refine, boxes are refined at full resolution (see detection_crops).
+    With a split manifest (see src.splits), only the images of the split are detected.
+    Returns the predictions, or None with keep_preds=False.
+    """
+    preds = []
+    members = None if splits is None else split_members(splits, split)
     if get_cropped_images:
         # Ensure the output folder for cropped images exists
-        output_dir = f"cropped_images/{split}"
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Loop through the predictions and images
-        for pred in preds:
-            # Paths to the downscaled and original images
-            downscaled_image_path = pred.path
-            image_name = os.path.basename(downscaled_image_path)
-            original_image_path = os.path.join("data", split, image_name)
-
-            # Load the downscaled and original images
-            downscaled_image = Image.open(downscaled_image_path)
-            original_image = Image.open(original_image_path)
-
-            # Get image dimensions
-            W_down, H_down = downscaled_image.size
-            W_orig, H_orig = original_image.size
-
-            # Calculate scale factors
-            scale_x = W_orig / W_down
-            scale_y = H_orig / H_down
-
-            # Extract bounding boxes
-            boxes = pred.boxes.xyxy
-            for i, box in enumerate(boxes):
-                # Get bounding box coordinates and adjust them
-                x_min, y_min, x_max, y_max = box[:4]
-                x_min_orig = int(x_min * scale_x)
-                y_min_orig = int(y_min * scale_y)
-                x_max_orig = int(x_max * scale_x)
-                y_max_orig = int(y_max * scale_y)
-
-                # Crop the original image
-                cropped_image = original_image.crop((x_min_orig, y_min_orig, x_max_orig, y_max_orig))
+        output_dir = output_dir or f"cropped_images/{split}"
+        store = None
+        box_rows = []
+        if store_path is not None:
+            store = CropStoreWriter(store_path, height=store_height)
+        else:
+            os.makedirs(output_dir, exist_ok=True)
+
+    options = _refine_options(refine)
+    coarse_conf = None if options is None else options.get('coarse_conf', COARSE_CONF)
+    skip_empty = not (options or {}).get('tile_empty')
+
+    # Loop through the predictions and images
+    for image_name, pred in iter_detections(model, split, batch_size, prefetch, device, conf=coarse_conf,
+                                             members=members):
+        if keep_preds:
+            preds.append(pred)
+        if tracing.is_enabled() and getattr(pred, 'speed', None):
+            # Detector time per image, as measured by ultralytics (ms)
+            tracing.record('detect_image', sum(pred.speed.values()) / 1000, key=image_name)
+
+        if not get_cropped_images or (skip_empty and len(pred.boxes.xyxy) == 0):
+            continue
+
+        original_image_path = os.path.join("data", split, image_name)
+
+        with tracing.span('crop', key=image_name):
+            # Decode the original image once for all of its boxes
+            original_image = cv2.imread(original_image_path)
+            if original_image is None:
+                print(f"Could not read image: {original_image_path}")
+                tracing.count('unreadable_images')
+                continue
+
+            boxes, confidences, crops = detection_crops(model, pred, original_image, pad=pad, clamp=clamp,
+                                                        refine=refine, device=device)
+            written = 0
+            for i, (box, cropped_image) in enumerate(zip(boxes, crops)):
+                if cropped_image.size == 0:
+                    # The box collapsed to zero width or height after rescaling and clamping
+                    tracing.count('empty_crops')
+                    continue
+                written += 1
+                box_rows.append((crop_filename(image_name, i), *box, float(confidences[i])))
+                if store is not None:
+                    store.add(image_name, i, cropped_image)
+                    continue
 
                 # Save the cropped image
-                cropped_image_name = f"{os.path.splitext(image_name)[0]}_crop_{i}.jpg"
-                cropped_image.save(os.path.join(output_dir, cropped_image_name))
+                cv2.imwrite(os.path.join(output_dir, crop_filename(image_name, i)), cropped_image)
+        tracing.count('crops', written)
+
+    if get_cropped_images:
+        if store is not None:
+            store.close()
+        # Keep the boxes so that evaluation can match crops to true plates
+        pd.DataFrame(box_rows, columns=['filename', 'x_min', 'y_min', 'x_max', 'y_max', 'conf']).to_csv(
+            os.path.join(store_path or output_dir, BOXES_FILE), index=False)
+        print(f"Saved {len(box_rows)} cropped images to {store_path or output_dir}")
+
+    return preds if keep_preds else None
+
+def iter_crops(model, split, device=None, pad=0.0, clamp=True, batch_size=16, prefetch=2, refine=None,
+               splits=None):
+    """
+    Stream plate crops from the original images as numpy arrays, without writing to disk.
+    With a split manifest, only the images of the split are used.
+    """
+    members = None if splits is None else split_members(splits, split)
+    options = _refine_options(refine)
+    coarse_conf = None if options is None else options.get('coarse_conf', COARSE_CONF)
+    skip_empty = not (options or {}).get('tile_empty')
+
+    for image_name, pred in iter_detections(model, split, batch_size, prefetch, device, conf=coarse_conf,
+                                             members=members):
+        if skip_empty and len(pred.boxes.xyxy) == 0:
+            continue
+
+        original_image_path = os.path.join("data", split, image_name)
 
-                print(f"Cropped image saved: {cropped_image_name}")
+        with tracing.span('crop', key=image_name):
+            original_image = cv2.imread(original_image_path)
+            if original_image is None:
+                print(f"Could not read image: {original_image_path}")
+                tracing.count('unreadable_images')
+                continue
 
-    return preds
+            boxes, _, crops = detection_crops(model, pred, original_image, pad=pad, clamp=clamp,
+                                              refine=refine, device=device)
+        tracing.count('crops', len(crops))
+        for i, (box, crop) in enumerate(zip(boxes, crops)):
+            yield {
+                'image_name': image_name,
+                'crop_idx': i,
+                'box': tuple(int(v) for v in box),
+                'crop': crop,
+            }
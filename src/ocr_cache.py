@@ -0,0 +1,162 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# Rough per-row overhead of the on-disk tier, on top of the key and text bytes
+_ROW_OVERHEAD = 48
+
+def _thumbnail(image):
+    """
+    Coarse grayscale thumbnail that is equal for near-duplicate crops.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    thumb = cv2.resize(gray, (64, 16), interpolation=cv2.INTER_AREA)
+    return (thumb >> 4).astype(np.uint8)
+
+def cache_key(image, engine, model_id=None, settings='', near_duplicates=False):
+    """
+    Hash of the crop pixels plus everything else that changes the OCR result:
+    engine, model and preprocessing settings. With near_duplicates, a quantized
+    thumbnail is hashed instead of the exact pixels, so slightly different crops
+    of the same plate share one entry.
+    """
+    image = np.ascontiguousarray(_thumbnail(image) if near_duplicates else image)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{engine}|{model_id}|{settings}|{image.shape}|{image.dtype}|'.encode())
+    digest.update(image.data)
+    return digest.digest()
+
+class OCRCache:
+    """
+    Two-tier OCR result cache: an in-memory LRU of up to max_items entries and an
+    optional SQLite file at `path`, trimmed to max_bytes by least recent use.
+    """
+
+    def __init__(self, path=None, max_items=10000, max_bytes=64 * 1024 * 1024, near_duplicates=False):
+        self.path = path
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.near_duplicates = near_duplicates
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS ocr '
+                             '(key BLOB PRIMARY KEY, text TEXT, size INTEGER, last_used REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS ocr_last_used ON ocr (last_used)')
+            self._disk_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM ocr').fetchone()[0]
+
+    def key(self, image, engine, model_id=None, settings=''):
+        return cache_key(image, engine, model_id, settings, self.near_duplicates)
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """
+        Look up keys. Returns {key: text} for the keys that are cached.
+        Hits and misses are counted per lookup, so repeated keys count each time.
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self.hits['memory'] += sum(key in found for key in keys)
+
+            missing = list(dict.fromkeys(key for key in keys if key not in found))
+            if self._db is not None and missing:
+                rows = []
+                # Stay below SQLite's limit on query parameters
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows += self._db.execute(
+                        f"SELECT key, text FROM ocr WHERE key IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                now = time.time()
+                self._db.executemany('UPDATE ocr SET last_used = ? WHERE key = ?', [(now, key) for key, _ in rows])
+                self._db.commit()
+                for key, text in rows:
+                    found[key] = text
+                    self._remember(key, text)
+                disk_keys = {key for key, _ in rows}
+                self.hits['disk'] += sum(key in disk_keys for key in keys)
+
+            self.misses += sum(key not in found for key in keys)
+        return found
+
+    def put_many(self, items):
+        """
+        Store (key, text) pairs in both tiers.
+        """
+        with self._lock:
+            for key, text in items:
+                self._remember(key, text)
+            if self._db is None or not items:
+                return
+            now = time.time()
+            rows = list({key: (key, text, len(key) + len(text.encode()) + _ROW_OVERHEAD, now)
+                         for key, text in items}.values())
+            replaced = 0
+            for start in range(0, len(rows), 500):
+                chunk = [row[0] for row in rows[start:start + 500]]
+                replaced += self._db.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM ocr WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchone()[0]
+            self._db.executemany('INSERT OR REPLACE INTO ocr VALUES (?, ?, ?, ?)', rows)
+            self._disk_bytes += sum(row[2] for row in rows) - replaced
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # Trim to 90% of the budget so eviction does not run on every insert
+        budget = 0.9 * self.max_bytes
+        kept, stale = 0, []
+        for key, size in self._db.execute('SELECT key, size FROM ocr ORDER BY last_used DESC'):
+            if kept + size <= budget:
+                kept += size
+            else:
+                stale.append((key,))
+        self._db.executemany('DELETE FROM ocr WHERE key = ?', stale)
+        self._disk_bytes = kept
+
+    def stats(self):
+        """
+        Hit/miss counts per tier and the current size of each tier.
+        """
+        lookups = self.hits['memory'] + self.hits['disk'] + self.misses
+        return {
+            'memory_hits': self.hits['memory'],
+            'disk_hits': self.hits['disk'],
+            'misses': self.misses,
+            'hit_rate': (lookups - self.misses) / lookups if lookups else 0.0,
+            'memory_items': len(self._memory),
+            'disk_bytes': self._disk_bytes if self._db is not None else 0,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
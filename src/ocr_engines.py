@@ -0,0 +1,313 @@
+import re
+import json
+import cv2
+import numpy as np
+from src import tracing
+from src.refine import nms
+
+# Recognizers are loaded lazily and cached per process, keyed by (engine, model_id)
+_RECOGNIZERS = {}
+
+EASYOCR_ALLOWLIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 '
+
+# Spanish plates: current 1234BCD format (no vowels, Q or Ñ) and the older provincial M1234AB format
+PLATE_PATTERN = r'^(\d{4}[BCDFGHJKLMNPRSTVWXYZ]{3}|[A-Z]{1,2}\d{4}[A-Z]{1,3})$'
+
+def _load_easyocr(model_id):
+    import easyocr
+    return easyocr.Reader([model_id])
+
+def _easyocr_canvas(images):
+    """
+    Stack grayscale crops into one image, returning it with the region of each crop
+    as an EasyOCR horizontal_list box [x_min, x_max, y_min, y_max].
+    """
+    grays = [cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image for image in images]
+    canvas = np.zeros((sum(gray.shape[0] for gray in grays), max(gray.shape[1] for gray in grays)), np.uint8)
+    regions, y = [], 0
+    for gray in grays:
+        h, w = gray.shape
+        canvas[y:y + h, :w] = gray
+        regions.append([0, w, y, y + h])
+        y += h
+    return canvas, regions
+
+def _run_easyocr_scored(reader, images):
+    """
+    Recognize a batch of crops with one EasyOCR recognize call, keeping its confidence.
+    Every crop is a single text region, so detection is skipped: the crops are given
+    as the regions of one stacked image. On CPU, EasyOCR itself still runs the
+    recognizer one region at a time; on GPU the whole batch goes through at once.
+    """
+    canvas, regions = _easyocr_canvas(images)
+    reads = reader.recognize(canvas, horizontal_list=regions, free_list=[], allowlist=EASYOCR_ALLOWLIST,
+                             batch_size=len(images))
+    # Results come back sorted by position; the top of each box identifies its crop
+    by_top = {int(box[0][1]): (text, confidence) for box, text, confidence in reads}
+    results = []
+    for _, _, y_min, _ in regions:
+        if y_min in by_top:
+            text, confidence = by_top[y_min]
+            results.append({'ocr_text': text.replace(' ', '').strip(), 'confidence': float(confidence)})
+        else:
+            results.append({'ocr_text': '', 'confidence': 0.0})
+    return results
+
+def _run_easyocr(reader, images):
+    """
+    Recognize a batch of crops with EasyOCR.
+    """
+    return [result['ocr_text'] for result in _run_easyocr_scored(reader, images)]
+
+def _load_fast_plate_ocr(model_id):
+    from fast_plate_ocr import ONNXPlateRecognizer
+    return ONNXPlateRecognizer(model_id)
+
+def _fast_plate_ocr_inputs(recognizer, images):
+    height = recognizer.config['img_height']
+    width = recognizer.config['img_width']
+    batch = []
+    for image in images:
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        batch.append(cv2.resize(image, (width, height), interpolation=cv2.INTER_LINEAR))
+    return batch
+
+def _run_fast_plate_ocr(recognizer, images):
+    """
+    Recognize a batch of crops with a single fast-plate-ocr inference call.
+    """
+    result = recognizer.run(_fast_plate_ocr_inputs(recognizer, images))
+    return [text.rstrip('_') for text in result]
+
+def _run_fast_plate_ocr_scored(recognizer, images):
+    """
+    Like _run_fast_plate_ocr, with the confidence of the least certain character of each plate.
+    """
+    plates, probs = recognizer.run(_fast_plate_ocr_inputs(recognizer, images), return_confidence=True)
+    results = []
+    for text, char_probs in zip(plates, np.asarray(probs)):
+        text = text.rstrip('_')
+        confidence = float(char_probs[:len(text)].min()) if text else 0.0
+        results.append({'ocr_text': text, 'confidence': confidence})
+    return results
+
+# Character detector trained on the OCR/ dataset of labels2yolo with cfg_ocr.yaml
+YOLO_OCR_IMGSZ = 160
+
+def _load_yolo_ocr(model_id):
+    from ultralytics import YOLO
+    from src.model_utils import select_device
+    model = YOLO(model_id)
+    return {'model': model, 'device': select_device(), 'names': np.array([model.names[i] for i in range(len(model.names))])}
+
+def characters_to_text(boxes, scores, classes, names, iou_threshold=0.5, row_gap=0.6):
+    """
+    Turn the character boxes of one plate into its text. Overlapping boxes of any
+    class are merged with NMS, characters are split into two rows if a vertical gap
+    between their centres exceeds row_gap times the median character height, and
+    read top row first, left to right. Returns the text and the lowest character score.
+    """
+    if len(boxes) == 0:
+        return '', 0.0
+    keep = nms(boxes, scores, iou_threshold)
+    boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    row = np.zeros(len(boxes), dtype=int)
+    if len(boxes) > 1:
+        y = np.sort(centers[:, 1])
+        gaps = np.diff(y)
+        split = gaps.argmax()
+        if gaps[split] > row_gap * np.median(boxes[:, 3] - boxes[:, 1]):
+            row = (centers[:, 1] > (y[split] + y[split + 1]) / 2).astype(int)
+    order = np.lexsort((centers[:, 0], row))
+    return ''.join(names[classes[order]]), float(scores.min())
+
+def _run_yolo_ocr_scored(recognizer, images):
+    """
+    Detect the characters of a batch of crops with a single detector call.
+    """
+    # The detector was trained on colour crops
+    images = [cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image for image in images]
+    preds = recognizer['model'].predict(images, imgsz=YOLO_OCR_IMGSZ, device=recognizer['device'], verbose=False)
+    results = []
+    for pred in preds:
+        pred = pred.cpu().numpy()
+        text, confidence = characters_to_text(pred.boxes.xyxy[:, :4], pred.boxes.conf, pred.boxes.cls.astype(int),
+                                              recognizer['names'])
+        results.append({'ocr_text': text, 'confidence': confidence})
+    return results
+
+def _run_yolo_ocr(recognizer, images):
+    """
+    Recognize a batch of crops with the character detector.
+    """
+    return [result['ocr_text'] for result in _run_yolo_ocr_scored(recognizer, images)]
+
+ENGINES = {
+    'easyocr': {
+        'load': _load_easyocr,
+        'run': _run_easyocr,
+        'run_scored': _run_easyocr_scored,
+        'default_model': 'en',
+    },
+    'fast_plate_ocr': {
+        'load': _load_fast_plate_ocr,
+        'run': _run_fast_plate_ocr,
+        'run_scored': _run_fast_plate_ocr_scored,
+        'default_model': 'european-plates-mobile-vit-v2-model',
+    },
+    'yolo_ocr': {
+        'load': _load_yolo_ocr,
+        'run': _run_yolo_ocr,
+        'run_scored': _run_yolo_ocr_scored,
+        'default_model': 'runs/detect/ocr/weights/best.pt',
+    },
+}
+
+def register_engine(name, load, run, default_model=None, run_scored=None):
+    """
+    Register an OCR engine. `load(model_id)` builds a recognizer and
+    `run(recognizer, images)` returns one text per image in the batch.
+    The optional `run_scored(recognizer, images)` returns one dict per image
+    with 'ocr_text', 'confidence' and, if it differs from `name`, 'engine'.
+    """
+    ENGINES[name] = {'load': load, 'run': run, 'default_model': default_model, 'run_scored': run_scored}
+
+def get_engine(name):
+    """
+    Look up a registered OCR engine by name.
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine '{name}'. Expected one of {sorted(ENGINES)}.")
+    return ENGINES[name]
+
+def get_recognizer(engine, model_id=None):
+    """
+    Return the recognizer for the engine, loading it on first use only.
+    """
+    spec = get_engine(engine)
+    model_id = model_id or spec['default_model']
+    key = (engine, model_id)
+    if key not in _RECOGNIZERS:
+        _RECOGNIZERS[key] = spec['load'](model_id)
+    return _RECOGNIZERS[key]
+
+def clear_recognizers():
+    """
+    Drop all cached recognizers.
+    """
+    _RECOGNIZERS.clear()
+
+def iter_batches(items, batch_size):
+    """
+    Yield consecutive lists of at most batch_size items.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}.")
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def read_images(paths):
+    """
+    Decode a batch of image files. Returns the paths that could be read and their images.
+    """
+    read_paths, images = [], []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"Could not read image: {path}")
+            continue
+        read_paths.append(path)
+        images.append(image)
+    return read_paths, images
+
+def _run_engine(images, engine, model_id, scored):
+    spec = get_engine(engine)
+    recognizer = get_recognizer(engine, model_id)
+    if not scored:
+        return spec['run'](recognizer, images)
+    if spec.get('run_scored') is None:
+        return [{'ocr_text': text, 'confidence': None, 'engine': engine} for text in spec['run'](recognizer, images)]
+    return [{'engine': engine, **result} for result in spec['run_scored'](recognizer, images)]
+
+def recognize_batch(images, engine='easyocr', model_id=None, cache=None, settings='', scored=False):
+    """
+    Recognize a batch of decoded crops with the given engine. With an OCRCache,
+    only crops that are not cached (and not repeated within the batch) reach the
+    recognizer. `settings` describes any preprocessing applied to the crops.
+    With scored, each result is a dict with 'ocr_text', 'confidence' (None if
+    the engine has none) and 'engine' (the engine that produced the text).
+    """
+    if not images:
+        return []
+    if cache is None:
+        return _run_engine(images, engine, model_id, scored)
+
+    model_id = model_id or get_engine(engine)['default_model']
+    if scored:
+        settings += '|scored'
+    keys = [cache.key(image, engine, model_id, settings) for image in images]
+    results = cache.get_many(keys)
+    # Per lookup, like the hits and misses of OCRCache.stats()
+    hits = sum(key in results for key in keys)
+    tracing.count('ocr_cache_hits', hits)
+    tracing.count('ocr_cache_misses', len(keys) - hits)
+
+    # One recognition per distinct missing crop
+    missing = {}
+    for key, image in zip(keys, images):
+        if key not in results and key not in missing:
+            missing[key] = image
+    if missing:
+        new_results = _run_engine(list(missing.values()), engine, model_id, scored)
+        results.update(zip(missing, map(json.dumps, new_results) if scored else new_results))
+        cache.put_many([(key, results[key]) for key in missing])
+    if scored:
+        return [json.loads(results[key]) for key in keys]
+    return [results[key] for key in keys]
+
+def is_valid_plate(text, pattern=PLATE_PATTERN):
+    """
+    Whether the text matches the plate format.
+    """
+    return re.match(pattern, text) is not None
+
+def register_cascade(name='cascade', fast_engine='fast_plate_ocr', slow_engine='easyocr', min_confidence=0.9,
+                     pattern=PLATE_PATTERN, fast_model=None, slow_model=None):
+    """
+    Register an engine that reads every crop with fast_engine and re-reads only
+    the crops whose fast read is below min_confidence or does not match `pattern`
+    with slow_engine. The slow read is kept unless it is invalid while the fast
+    one is valid. Scored results name the engine that produced each text.
+    """
+    def load(model_id):
+        return None
+
+    def run_scored(recognizer, images):
+        results = _run_engine(images, fast_engine, fast_model, scored=True)
+        escalate = [i for i, result in enumerate(results)
+                    if (result['confidence'] or 0.0) < min_confidence or not is_valid_plate(result['ocr_text'], pattern)]
+        tracing.count('cascade_escalations', len(escalate))
+        if escalate:
+            slow_results = _run_engine([images[i] for i in escalate], slow_engine, slow_model, scored=True)
+            for i, slow in zip(escalate, slow_results):
+                if is_valid_plate(slow['ocr_text'], pattern) or not is_valid_plate(results[i]['ocr_text'], pattern):
+                    results[i] = slow
+        return results
+
+    def run(recognizer, images):
+        return [result['ocr_text'] for result in run_scored(recognizer, images)]
+
+    # The settings make up the model id, so cached results of other settings are not reused
+    model_id = f'{fast_engine}:{fast_model}>{slow_engine}:{slow_model}@{min_confidence}/{pattern}'
+    register_engine(name, load, run, default_model=model_id, run_scored=run_scored)
+
+register_cascade()
@@ -1,53 +1,71 @@
 import os
-import easyocr
+import time
 import pandas as pd
-from fast_plate_ocr import ONNXPlateRecognizer
-from tqdm.notebook import tqdm
+from tqdm import tqdm
+from src import tracing
+from src.crop_store import CropStore, crop_store_path
+from src.ocr_engines import iter_batches, read_images, recognize_batch
 
-def perform_ocr(split='val', processed=False, output_csv=False, engine='easyocr'):
+def _iter_image_batches(input_dir, filenames, batch_size):
+    for batch in iter_batches(filenames, batch_size):
+        paths, images = read_images([os.path.join(input_dir, filename) for filename in batch])
+        yield batch, [os.path.basename(path) for path in paths], images
+
+def _iter_store_batches(store, batch_size):
+    for batch in iter_batches(range(len(store)), batch_size):
+        names = [store.filenames[i] for i in batch]
+        yield names, names, [store[i] for i in batch]
+
+def perform_ocr(split='val', processed=False, output_csv=False, engine='easyocr', batch_size=32, model_id=None,
+                use_store=False, cache=None):
     """
-    Perform OCR on cropped images using EasyOCR and optionally save results to a CSV.
+    Perform OCR on cropped images in batches and optionally save results to a CSV.
+    With use_store, crops are read from the memory-mapped crop store of the split.
+    With an OCRCache, crops that were recognized before are not recognized again.
     """
-    # Input directory for cropped images
-    input_dir = f"cropped_images_processed/{split}" if processed else f"cropped_images/{split}"
-    
-    if engine == 'easyocr':
-        # Initialize EasyOCR Reader once
-        reader = easyocr.Reader(['en'])  # Modify the language parameter as needed
+    if use_store:
+        store = CropStore(crop_store_path(split, processed))
+        filenames = store.filenames
+        batches = _iter_store_batches(store, batch_size)
+    else:
+        # Input directory for cropped images
+        input_dir = f"cropped_images_processed/{split}" if processed else f"cropped_images/{split}"
+        filenames = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(('.jpg', '.png', '.jpeg')))
+        batches = _iter_image_batches(input_dir, filenames, batch_size)
 
     # List to store OCR results
     ocr_results = []
     
-    # Iterate through cropped images
-    for filename in tqdm(os.listdir(input_dir)):
-        if filename.lower().endswith(('.jpg', '.png', '.jpeg')):
-            # Full path to the image
-            image_path = os.path.join(input_dir, filename)
-            
+    # Iterate through cropped images one batch at a time
+    with tqdm(total=len(filenames)) as progress:
+        for batch, names, images in batches:
+            start = time.perf_counter()
             try:
-                if engine == 'easyocr':
-                    reader = easyocr.Reader(['en'])
-                    result = reader.recognize(image_path, allowlist='ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ')
-                    ocr_text = result[0][1].replace(' ', '').strip()
-                
-                elif engine == 'fast_plate_ocr':
-                    m = ONNXPlateRecognizer('european-plates-mobile-vit-v2-model')
-                    result = m.run(image_path)
-                    ocr_text = result[0].rstrip('_')
-                
+                results = recognize_batch(images, engine=engine, model_id=model_id, cache=cache,
+                                          settings='processed' if processed else 'raw', scored=True)
+            except Exception as e:
+                print(f"Error processing batch starting at {batch[0]}: {e}")
+                tracing.count('ocr_errors', len(batch))
+                progress.update(len(batch))
+                continue
+            duration = time.perf_counter() - start
+            tracing.record('ocr_batch', duration)
+            tracing.count('ocr_images', len(names))
+
+            for filename, result in zip(names, results):
+                tracing.record('ocr', duration / len(names), key=filename)
                 # Store results
                 ocr_results.append({
                     'filename': filename,
-                    'ocr_text': ocr_text
+                    'ocr_text': result['ocr_text'],
+                    'confidence': result['confidence'],
+                    'engine': result['engine'],
                 })
-                
-                print(f"OCR for {filename}: {ocr_text}")
-            
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")
+
+            progress.update(len(batch))
     
     # Convert to DataFrame
-    df_ocr = pd.DataFrame(ocr_results)
+    df_ocr = pd.DataFrame(ocr_results, columns=['filename', 'ocr_text', 'confidence', 'engine'])
     
     # Optionally save to CSV
     if output_csv:
@@ -0,0 +1,117 @@
+import os
+import json
+import socket
+import socketserver
+import pandas as pd
+from src.ocr_cache import OCRCache
+from src.ocr_engines import get_recognizer, register_cascade
+from src.ocr_utils import perform_ocr
+
+WORKER_SOCKET = '.cache/ocr_worker.sock'
+
+RESULT_COLUMNS = ['filename', 'ocr_text', 'confidence', 'engine']
+
+class OCRWorker:
+    """
+    Keep OCR recognizers and caches loaded between perform_ocr requests. A request
+    is a dict of perform_ocr arguments plus 'cwd', 'cache_path', 'cache_max_mb',
+    'min_confidence' and 'plate_pattern'; requests are served one at a time.
+    """
+
+    def __init__(self):
+        self.caches = {}
+
+    def _cache(self, path, max_mb):
+        if path is None:
+            return None
+        path = os.path.abspath(path)
+        if path not in self.caches:
+            self.caches[path] = OCRCache(path, max_bytes=max_mb * 1024 * 1024)
+        return self.caches[path]
+
+    def handle(self, request):
+        # Crop folders are relative to the directory baseline.py was started from
+        os.chdir(request['cwd'])
+        register_cascade(min_confidence=request['min_confidence'], pattern=request['plate_pattern'])
+        cache = self._cache(request.get('cache_path'), request.get('cache_max_mb', 64))
+        before = cache.stats() if cache is not None else None
+        pred_labels = perform_ocr(split=request['split'], processed=request.get('processed', True),
+                                  engine=request['engine'], batch_size=request.get('batch_size', 32),
+                                  use_store=request.get('use_store', False), cache=cache)
+        response = {'records': pred_labels.to_dict('records')}
+        if cache is not None:
+            # Only the lookups of this request, not those since the worker started
+            after = cache.stats()
+            response['cache_stats'] = {key: after[key] - before[key]
+                                       for key in ('memory_hits', 'disk_hits', 'misses')}
+        return response
+
+    def close(self):
+        for cache in self.caches.values():
+            cache.close()
+        self.caches.clear()
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            response = self.server.worker.handle(json.loads(line))
+        except Exception as e:
+            response = {'error': f'{type(e).__name__}: {e}'}
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+def serve_worker(path=WORKER_SOCKET, warmup_engines=()):
+    """
+    Serve OCR requests on a unix socket until interrupted.
+    """
+    worker = OCRWorker()
+    for engine in warmup_engines:
+        print(f"Loading engine='{engine}'...")
+        get_recognizer(engine)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if os.path.exists(path):
+        # A socket left behind by a worker that did not shut down cleanly
+        os.remove(path)
+    server = socketserver.UnixStreamServer(path, _Handler)
+    server.worker = worker
+    print(f"OCR worker listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        worker.close()
+        os.remove(path)
+
+def worker_available(path=WORKER_SOCKET):
+    """
+    Whether a worker is listening on the socket.
+    """
+    if not os.path.exists(path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            return False
+    return True
+
+def request_ocr(path=WORKER_SOCKET, **request):
+    """
+    Run perform_ocr in the worker listening on the socket. Returns the OCR results
+    as a DataFrame and the cache statistics of the request (or None).
+    """
+    request.setdefault('cwd', os.getcwd())
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        with client.makefile('rwb') as stream:
+            stream.write(json.dumps(request).encode() + b'\n')
+            stream.flush()
+            response = json.loads(stream.readline())
+    if 'error' in response:
+        raise RuntimeError(f"OCR worker failed: {response['error']}")
+    return pd.DataFrame(response['records'], columns=RESULT_COLUMNS), response.get('cache_stats')
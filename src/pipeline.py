@@ -0,0 +1,68 @@
+import os
+import cv2
+from src import tracing
+from src.crop_store import crop_filename
+from src.image_processing import preprocess_crop
+from src.model_utils import iter_crops
+from src.ocr_engines import iter_batches, recognize_batch
+
+def iter_preprocessed(crops, debug_dir=None, preprocess=True, deskew_method='hough'):
+    """
+    Deskew and binarize streamed crops. If debug_dir is set, the raw and processed
+    crops are also written there as the 'cropped' and 'processed' intermediates.
+    """
+    if debug_dir is not None:
+        os.makedirs(os.path.join(debug_dir, "cropped"), exist_ok=True)
+        os.makedirs(os.path.join(debug_dir, "processed"), exist_ok=True)
+
+    for item in crops:
+        item['filename'] = crop_filename(item['image_name'], item['crop_idx'])
+        if item['crop'].size == 0:
+            print(f"Empty crop: {item['filename']}")
+            continue
+        if preprocess:
+            with tracing.span('preprocess', key=item['filename']):
+                item['processed'] = preprocess_crop(item['crop'], deskew_method=deskew_method)
+
+        if debug_dir is not None:
+            cv2.imwrite(os.path.join(debug_dir, "cropped", item['filename']), item['crop'])
+            if preprocess:
+                cv2.imwrite(os.path.join(debug_dir, "processed", item['filename']), item['processed'])
+
+        yield item
+
+def iter_recognized(items, engine='easyocr', batch_size=32, model_id=None, processed=True,
+                    cache=None, settings=''):
+    """
+    Recognize streamed crops in batches and yield one OCR result per crop.
+    """
+    key = 'processed' if processed else 'crop'
+    for batch in iter_batches(items, batch_size):
+        with tracing.span('ocr_batch'):
+            results = recognize_batch([item[key] for item in batch], engine=engine, model_id=model_id,
+                                      cache=cache, settings=settings, scored=True)
+        tracing.count('ocr_images', len(batch))
+        for item, result in zip(batch, results):
+            yield {
+                'filename': item['filename'],
+                'ocr_text': result['ocr_text'],
+                'confidence': result['confidence'],
+                'engine': result['engine'],
+                'box': item['box'],
+            }
+
+def run_pipeline(model, split, engine='easyocr', batch_size=32, model_id=None,
+                 processed=True, debug_dir=None, device=None, deskew_method='hough', cache=None,
+                 detect_batch_size=16, prefetch=2, refine=None):
+    """
+    Detect, crop, preprocess and recognize plates in a single pass over a split.
+    Crops are passed along as numpy arrays and never touch disk unless debug_dir is set.
+    With refine, detection runs coarse-to-fine (see src/refine.py).
+    """
+    crops = iter_crops(model, split, device=device, batch_size=detect_batch_size, prefetch=prefetch,
+                       refine=refine)
+    items = iter_preprocessed(crops, debug_dir=debug_dir, preprocess=processed,
+                              deskew_method=deskew_method)
+    return iter_recognized(items, engine=engine, batch_size=batch_size,
+                           model_id=model_id, processed=processed, cache=cache,
+                           settings=f'deskew={deskew_method}' if processed else 'raw')
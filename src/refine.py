@@ -0,0 +1,85 @@
+import numpy as np
+from src import tracing
+from src.tracking import pairwise_iou
+
+# Coarse detections down to this confidence are kept as candidates for refinement
+COARSE_CONF = 0.1
+
+def nms(boxes, scores, iou_threshold=0.5):
+    """
+    Class-agnostic non-maximum suppression. Returns the indices of the kept boxes,
+    highest score first.
+    """
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    iou = pairwise_iou(boxes, boxes)
+    keep = []
+    suppressed = np.zeros(len(order), dtype=bool)
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= iou[i] > iou_threshold
+    return np.array(keep, dtype=int)
+
+def roi_regions(boxes, confs, image_shape, accept_conf=0.5, small_fraction=0.05, context=1.0):
+    """
+    Regions around the boxes worth a second look: borderline confidence (below
+    accept_conf) or smaller than small_fraction of the image width. Each region
+    grows its box by `context` times the box size on every side.
+    """
+    h, w = image_shape[:2]
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    widths = boxes[:, 2] - boxes[:, 0]
+    candidates = (np.asarray(confs) < accept_conf) | (widths < small_fraction * w)
+    boxes = boxes[candidates]
+    size = boxes[:, 2:] - boxes[:, :2]
+    regions = np.hstack([boxes[:, :2] - size * context, boxes[:, 2:] + size * context])
+    regions = np.clip(regions, 0, [w, h, w, h]).astype(int)
+    return [tuple(region) for region in regions if region[2] > region[0] and region[3] > region[1]]
+
+def tile_regions(image_shape, tiles=2, overlap=0.2):
+    """
+    A tiles x tiles grid over the image, with neighbouring tiles overlapping by
+    `overlap` of a tile so that plates on a border are whole in one tile.
+    """
+    h, w = image_shape[:2]
+    tile_w, tile_h = w / (tiles - (tiles - 1) * overlap), h / (tiles - (tiles - 1) * overlap)
+    regions = []
+    for row in range(tiles):
+        for col in range(tiles):
+            x0, y0 = col * tile_w * (1 - overlap), row * tile_h * (1 - overlap)
+            regions.append((int(x0), int(y0), min(w, int(round(x0 + tile_w))), min(h, int(round(y0 + tile_h)))))
+    return regions
+
+def refine_boxes(model, image, boxes, confs, device=None, coarse_conf=COARSE_CONF, accept_conf=0.5, final_conf=0.25,
+                 small_fraction=0.05, context=1.0, tile_empty=False, tiles=2, overlap=0.2, iou_threshold=0.5):
+    """
+    Second detection pass on an original-resolution image. The detector reruns on
+    upscaled regions around borderline or small coarse boxes and, with tile_empty,
+    on tiles of images without a confident box. All boxes are merged with NMS in
+    original coordinates and those scoring at least final_conf are returned.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    confs = np.asarray(confs, dtype=np.float64).reshape(-1)
+    regions = roi_regions(boxes, confs, image.shape, accept_conf, small_fraction, context)
+    if tile_empty and not (confs >= accept_conf).any():
+        regions += tile_regions(image.shape, tiles, overlap)
+
+    if regions:
+        tracing.count('refine_regions', len(regions))
+        with tracing.span('refine'):
+            preds = model.predict([image[y0:y1, x0:x1] for x0, y0, x1, y1 in regions], device=device,
+                                  conf=coarse_conf, verbose=False)
+        all_boxes, all_confs = [boxes], [confs]
+        for (x0, y0, _, _), pred in zip(regions, preds):
+            pred = pred.cpu().numpy()
+            # Region predictions are in region coordinates
+            all_boxes.append(pred.boxes.xyxy[:, :4] + [x0, y0, x0, y0])
+            all_confs.append(pred.boxes.conf)
+        boxes, confs = np.vstack(all_boxes), np.concatenate(all_confs)
+
+    if len(boxes):
+        keep = nms(boxes, confs, iou_threshold)
+        boxes, confs = boxes[keep], confs[keep]
+    confident = confs >= final_conf
+    return boxes[confident], confs[confident]
@@ -0,0 +1,236 @@
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from src import tracing
+from src.image_processing import preprocess_crop
+from src.model_utils import _to_numpy, prediction_crops
+from src.ocr_engines import recognize_batch
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+class Overloaded(Exception):
+    """
+    Raised when the request queue is full.
+    """
+
+def recognize_images(model, images, engine='easyocr', model_id=None, processed=True, device='cpu',
+                     deskew_method='hough', cache=None):
+    """
+    Detect and read the plates of a batch of decoded images with one detector call
+    and one OCR call. Returns one list of {'box', 'conf', 'text', 'text_conf', 'engine'} per image.
+    """
+    preds = model.predict(images, device=device, verbose=False)
+    results = [[] for _ in images]
+    plates, crops = [], []
+    for result, pred, image in zip(results, preds, images):
+        boxes, image_crops = prediction_crops(pred, image)
+        confs = _to_numpy(pred.boxes.conf)
+        for box, crop, conf in zip(boxes, image_crops, confs):
+            if crop.size == 0:
+                continue
+            plate = {'box': [int(v) for v in box], 'conf': round(float(conf), 4)}
+            result.append(plate)
+            plates.append(plate)
+            crops.append(preprocess_crop(crop, deskew_method=deskew_method) if processed else crop)
+
+    reads = recognize_batch(crops, engine=engine, model_id=model_id, cache=cache,
+                            settings=f'deskew={deskew_method}' if processed else 'raw', scored=True)
+    for plate, read in zip(plates, reads):
+        plate['text'] = read['ocr_text']
+        plate['text_conf'] = read['confidence']
+        plate['engine'] = read['engine']
+    return results
+
+class MicroBatcher:
+    """
+    Gather submitted items into batches of up to max_batch, waiting at most
+    max_latency seconds after the first item of a batch arrived. `process(items)`
+    runs in a worker thread and returns one result per item. The queue holds at most
+    max_queue items; beyond that, submit() raises Overloaded instead of waiting.
+    """
+
+    def __init__(self, process, max_batch=16, max_latency=0.01, max_queue=128):
+        self.process = process
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.queue = asyncio.Queue(max_queue)
+        # A single inference thread keeps the event loop free for I/O
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.stats = {'requests': 0, 'rejected': 0, 'batches': 0, 'batched_items': 0, 'errors': 0}
+
+    async def submit(self, item):
+        self.stats['requests'] += 1
+        if self.queue.full():
+            self.stats['rejected'] += 1
+            raise Overloaded()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = batch[0][2] + self.max_latency
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout <= 0:
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Requests whose client went away are dropped before inference
+            batch = [entry for entry in await self._next_batch() if not entry[1].done()]
+            if not batch:
+                continue
+            self.stats['batches'] += 1
+            self.stats['batched_items'] += len(batch)
+            tracing.count('server_batches')
+            try:
+                results = await loop.run_in_executor(self.executor, self.process, [item for item, _, _ in batch])
+            except Exception as e:
+                self.stats['errors'] += len(batch)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+class PlateServer:
+    """
+    HTTP/1.1 service around a MicroBatcher. Routes:
+      POST /recognize  image bytes (JPEG/PNG) -> {'plates': [...], 'latency_ms'}
+      GET  /health     -> {'status', 'queue'}
+      GET  /metrics    -> Prometheus text
+    """
+
+    def __init__(self, model, engine='easyocr', model_id=None, processed=True, device='cpu',
+                 deskew_method='hough', cache=None, max_batch=16, max_latency=0.01, max_queue=128):
+        self.model = model
+        self.options = {'engine': engine, 'model_id': model_id, 'processed': processed,
+                        'device': device, 'deskew_method': deskew_method, 'cache': cache}
+        self.batcher = MicroBatcher(self._process, max_batch, max_latency, max_queue)
+
+    def _process(self, payloads):
+        images = [cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR) for payload in payloads]
+        valid = [i for i, image in enumerate(images) if image is not None]
+        results = [None] * len(images)
+        if valid:
+            with tracing.span('server_batch'):
+                plates = recognize_images(self.model, [images[i] for i in valid], **self.options)
+            for i, image_plates in zip(valid, plates):
+                results[i] = image_plates
+        return results
+
+    def warmup(self):
+        """
+        Run one dummy image through detector and OCR so the first request pays no startup cost.
+        """
+        _, encoded = cv2.imencode('.jpg', np.full((480, 640, 3), 128, np.uint8))
+        self._process([encoded.tobytes()])
+        recognize_batch([np.full((32, 128, 3), 255, np.uint8)], engine=self.options['engine'],
+                        model_id=self.options['model_id'])
+
+    def metrics(self):
+        stats = self.batcher.stats
+        lines = [f'anpr_server_{name}_total {value}' for name, value in stats.items()]
+        lines.append(f'anpr_server_queue_depth {self.batcher.queue.qsize()}')
+        if stats['batches']:
+            lines.append(f"anpr_server_mean_batch_size {stats['batched_items'] / stats['batches']:.3f}")
+        text = '\n'.join(lines) + '\n'
+        if tracing.is_enabled():
+            text += tracing.to_prometheus()
+        return text
+
+    async def route(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', 'queue': self.batcher.queue.qsize()}
+        if method == 'GET' and path == '/metrics':
+            return 200, self.metrics()
+        if method == 'POST' and path == '/recognize':
+            start = time.perf_counter()
+            try:
+                plates = await self.batcher.submit(body)
+            except Overloaded:
+                return 503, {'error': 'queue full, retry later'}
+            if plates is None:
+                return 400, {'error': 'could not decode image'}
+            return 200, {'plates': plates, 'latency_ms': round((time.perf_counter() - start) * 1000, 2)}
+        return 404, {'error': f'no route for {method} {path}'}
+
+    async def handle(self, reader, writer):
+        """
+        Serve requests on one connection, keeping it alive unless asked otherwise.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {'error': 'image too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload = await self.route(method, path.split('?')[0], body)
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive=True):
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload).encode(), 'application/json'
+        headers = [f'HTTP/1.1 {status} {HTTP_REASONS[status]}',
+                   f'Content-Type: {content_type}',
+                   f'Content-Length: {len(body)}',
+                   f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if status == 503:
+            headers.append('Retry-After: 1')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+        await writer.drain()
+
+    async def serve(self, host='127.0.0.1', port=8000, unix_path=None):
+        batcher = asyncio.create_task(self.batcher.run())
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+            print(f"Serving on unix socket {unix_path}")
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            print(f"Serving on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
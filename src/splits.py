@@ -0,0 +1,139 @@
+import os
+import json
+import random
+
+SPLITS_FILE = 'splits.json'
+SPLITS = ('train', 'val', 'test')
+# Folder of the UC3M-LP download that holds the files of each split
+SOURCE_SPLITS = {'train': 'train', 'val': 'train', 'test': 'test'}
+VIEW_EXTENSIONS = ('.jpg', '.json')
+
+def read_split_list(path):
+    """
+    Image names (without extension) listed in a UC3M-LP train.txt/test.txt.
+    """
+    with open(path, 'r') as f:
+        return [os.path.splitext(os.path.basename(line.strip()))[0] for line in f if line.strip()]
+
+def create_split_manifest(source_dir, val_fraction=0.2, seed=0, val_names=None):
+    """
+    Assign every image of the dataset at source_dir to train, val or test. The
+    test split is the UC3M-LP one; val is a seeded random val_fraction of the
+    UC3M-LP train split, or exactly `val_names` if given.
+    """
+    train_names = sorted(read_split_list(os.path.join(source_dir, 'train.txt')))
+    test_names = sorted(read_split_list(os.path.join(source_dir, 'test.txt')))
+    if val_names is None:
+        shuffled = list(train_names)
+        random.Random(seed).shuffle(shuffled)
+        val = set(shuffled[int(len(shuffled) * (1 - val_fraction)):])
+    else:
+        val = set(val_names)
+    return {
+        'source': os.path.normpath(source_dir),
+        'seed': seed if val_names is None else None,
+        'val_fraction': val_fraction if val_names is None else None,
+        'splits': {
+            'train': [name for name in train_names if name not in val],
+            'val': [name for name in train_names if name in val],
+            'test': test_names,
+        },
+    }
+
+def save_split_manifest(manifest, path=SPLITS_FILE):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+def load_split_manifest(path=SPLITS_FILE):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def load_or_create_split_manifest(path, source_dir, val_fraction=None, seed=None, resplit=False):
+    """
+    Load the manifest at path, or create and save one if there is none. A stored
+    manifest is never replaced implicitly: a seed or val_fraction that is passed
+    and differs from it raises ValueError, unless resplit is set to create a new
+    split. Unset, they default to 0 and 0.2 for a new manifest.
+    """
+    if os.path.exists(path) and not resplit:
+        manifest = load_split_manifest(path)
+        if manifest['source'] != os.path.normpath(source_dir):
+            raise ValueError(f"Split manifest {path} was made from {manifest['source']}, not {source_dir}. "
+                             f"Pass --resplit to replace it.")
+        for name, value in (('seed', seed), ('val_fraction', val_fraction)):
+            if value is not None and manifest[name] != value:
+                raise ValueError(f"Split manifest {path} has {name}={manifest[name]}, not {value}. "
+                                 f"Pass --resplit to replace it.")
+        return manifest
+    manifest = create_split_manifest(source_dir, 0.2 if val_fraction is None else val_fraction,
+                                     0 if seed is None else seed)
+    save_split_manifest(manifest, path)
+    counts = {split: len(names) for split, names in manifest['splits'].items()}
+    print(f"Saved split manifest to {path}: {counts}")
+    return manifest
+
+def split_members(manifest, split):
+    """
+    Names of the images of a split, as a set for O(1) membership tests.
+    """
+    if split not in SPLITS:
+        raise ValueError(f"Invalid split '{split}'. Expected one of {SPLITS}.")
+    return frozenset(manifest['splits'][split])
+
+def split_lookup(manifest):
+    """
+    Map every image name to its split.
+    """
+    return {name: split for split, names in manifest['splits'].items() for name in names}
+
+def _link(source, target, link):
+    if link == 'hardlink':
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            # Hard links cannot cross file systems
+            pass
+    os.symlink(os.path.abspath(source), target)
+
+def build_split_view(manifest, split, view_root='data', link='hardlink'):
+    """
+    Make view_root/<split> hold exactly the images and annotations of the split,
+    as hard links (or symlinks) to the dataset files, so no image bytes are copied
+    or moved. Files of other splits are unlinked, unless they are the only copy.
+    Returns the number of links added and removed.
+    """
+    source_dir = os.path.join(manifest['source'], SOURCE_SPLITS[split])
+    view_dir = os.path.join(view_root, split)
+    os.makedirs(view_dir, exist_ok=True)
+    if os.path.samefile(source_dir, view_dir):
+        raise ValueError(f"The view {view_dir} is the dataset folder itself.")
+
+    wanted = {name + ext for name in manifest['splits'][split] for ext in VIEW_EXTENSIONS}
+    existing = set(os.listdir(view_dir))
+
+    removed = kept = 0
+    for filename in existing - wanted:
+        path = os.path.join(view_dir, filename)
+        if os.path.islink(path) or (os.path.isfile(path) and os.stat(path).st_nlink > 1):
+            os.remove(path)
+            removed += 1
+        elif filename.endswith(VIEW_EXTENSIONS):
+            kept += 1
+    if kept:
+        print(f"Kept {kept} files in {view_dir} that are not in the split: they are not links and may be the only copy")
+
+    added = 0
+    for filename in sorted(wanted - existing):
+        source = os.path.join(source_dir, filename)
+        if os.path.exists(source):
+            _link(source, os.path.join(view_dir, filename), link)
+            added += 1
+    return added, removed
+
+def build_split_views(manifest, view_root='data', link='hardlink', splits=SPLITS):
+    for split in splits:
+        added, removed = build_split_view(manifest, split, view_root, link)
+        print(f"{view_root}/{split}: {len(manifest['splits'][split])} images, {added} links added, {removed} removed")
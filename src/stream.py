@@ -0,0 +1,77 @@
+import os
+import cv2
+from src import tracing
+from src.image_processing import IMAGE_EXTENSIONS, preprocess_crop
+from src.model_utils import prediction_crops, select_device
+from src.ocr_engines import recognize_batch
+from src.tracking import PlateTracker
+
+def iter_frames(source, frame_skip=1):
+    """
+    Yield (frame_idx, frame) for every frame_skip-th frame of a video file, a camera
+    index or a directory of frames (read in sorted filename order).
+    """
+    if os.path.isdir(source):
+        names = sorted(f for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTENSIONS))
+        for frame_idx in range(0, len(names), frame_skip):
+            frame = cv2.imread(os.path.join(source, names[frame_idx]))
+            if frame is not None:
+                yield frame_idx, frame
+        return
+
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video source: {source}")
+    frame_idx = 0
+    try:
+        while True:
+            # grab() skips decoding of the frames that are not processed
+            if not capture.grab():
+                break
+            if frame_idx % frame_skip == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    yield frame_idx, frame
+            frame_idx += 1
+    finally:
+        capture.release()
+
+def run_video(model, source, engine='easyocr', model_id=None, frame_skip=1, processed=True,
+              device=None, tracker=None, read_gain=0.25, max_reads=5, deskew_method='hough'):
+    """
+    Detect and track plates over a frame sequence and yield one consolidated
+    read per track once it leaves the scene (and for the remaining tracks at the end).
+    OCR only runs on confirmed tracks (seen in at least min_hits frames), on their
+    first crop and on crops that are noticeably sharper or larger than the ones
+    already read, so detector flicker costs no OCR calls.
+    """
+    tracker = tracker or PlateTracker()
+    device = select_device(device)
+    for frame_idx, frame in iter_frames(source, frame_skip):
+        tracing.count('frames')
+        with tracing.span('detect'):
+            pred = model.predict(frame, device=device, verbose=False)[0]
+        boxes, crops = prediction_crops(pred, frame)
+        tracks = tracker.update(boxes, frame_idx)
+
+        to_read = [(track, crop) for track, crop in zip(tracks, crops)
+                   if track.hits >= tracker.min_hits
+                   and track.needs_read(crop, gain=read_gain, max_reads=max_reads)]
+        if to_read:
+            images = []
+            for track, crop in to_read:
+                with tracing.span('preprocess'):
+                    images.append(preprocess_crop(crop, deskew_method=deskew_method) if processed else crop)
+            with tracing.span('ocr_batch'):
+                texts = recognize_batch(images, engine=engine, model_id=model_id)
+            tracing.count('ocr_images', len(images))
+            for (track, crop), text in zip(to_read, texts):
+                track.add_read(text, crop, frame_idx)
+        tracing.count('ocr_skipped', len(tracks) - len(to_read))
+
+        # Ages are in source frames, so skipped frames count towards expiry
+        for track in tracker.expire(frame_idx):
+            yield track.result()
+
+    for track in tracker.flush():
+        yield track.result()
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+import numpy as np
+
+# Tracing is off unless enabled in code or with ANPR_TRACE=1
+_enabled = os.environ.get('ANPR_TRACE', '') not in ('', '0')
+_lock = threading.Lock()
+_durations = defaultdict(list)
+_items = defaultdict(lambda: defaultdict(float))
+_counters = defaultdict(float)
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ('name', 'key', 'start')
+
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        with _lock:
+            _durations[self.name].append(duration)
+            if self.key is not None:
+                _items[self.key][self.name] += duration
+        return False
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    """
+    Forget all recorded spans and counters.
+    """
+    with _lock:
+        _durations.clear()
+        _items.clear()
+        _counters.clear()
+
+def span(name, key=None):
+    """
+    Time a block under `name`. If `key` is given (e.g. an image filename), the
+    duration is also added to that item's per-stage timings. Free when disabled.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, key)
+
+def count(name, value=1):
+    """
+    Add value to a counter.
+    """
+    if _enabled:
+        with _lock:
+            _counters[name] += value
+
+def record(name, duration, key=None):
+    """
+    Record a duration measured elsewhere, as if it had been timed with span().
+    """
+    if _enabled:
+        with _lock:
+            _durations[name].append(duration)
+            if key is not None:
+                _items[key][name] += duration
+
+def summary(per_item=True):
+    """
+    Aggregate timings per span, counters and, optionally, per-item timings.
+    """
+    with _lock:
+        durations = {name: np.array(values) for name, values in _durations.items()}
+        counters = dict(_counters)
+        items = {key: dict(stages) for key, stages in _items.items()} if per_item else None
+
+    spans = {}
+    for name, values in durations.items():
+        spans[name] = {
+            'count': int(values.size),
+            'total_s': float(values.sum()),
+            'mean_ms': float(values.mean() * 1000),
+            'p50_ms': float(np.percentile(values, 50) * 1000),
+            'p95_ms': float(np.percentile(values, 95) * 1000),
+            'max_ms': float(values.max() * 1000),
+        }
+    result = {'spans': spans, 'counters': counters}
+    if per_item:
+        result['items'] = items
+    return result
+
+def to_json(path, per_item=True):
+    with open(path, 'w') as f:
+        json.dump(summary(per_item), f, indent=2)
+
+def to_prometheus(path=None, prefix='anpr'):
+    """
+    Render spans and counters in the Prometheus text exposition format.
+    """
+    data = summary(per_item=False)
+    lines = [
+        f'# HELP {prefix}_span_seconds Time spent per pipeline stage.',
+        f'# TYPE {prefix}_span_seconds summary',
+    ]
+    for name, stats in sorted(data['spans'].items()):
+        for quantile, key in [('0.5', 'p50_ms'), ('0.95', 'p95_ms')]:
+            lines.append(f'{prefix}_span_seconds{{span="{name}",quantile="{quantile}"}} {stats[key] / 1000:.9f}')
+        lines.append(f'{prefix}_span_seconds_sum{{span="{name}"}} {stats["total_s"]:.9f}')
+        lines.append(f'{prefix}_span_seconds_count{{span="{name}"}} {stats["count"]}')
+    for name, value in sorted(data['counters'].items()):
+        metric = f'{prefix}_{name}_total'
+        lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric} {value:g}')
+    text = '\n'.join(lines) + '\n'
+
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
+
+def export(path):
+    """
+    Write the JSON report to path and the Prometheus metrics next to it (.prom).
+    """
+    to_json(path)
+    to_prometheus(os.path.splitext(path)[0] + '.prom')
+    print(f"Trace saved to {path}")
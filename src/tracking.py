@@ -0,0 +1,159 @@
+from collections import defaultdict
+import cv2
+import numpy as np
+
+def pairwise_iou(boxes_a, boxes_b):
+    """
+    IoU between every box of boxes_a (N, 4) and every box of boxes_b (M, 4), shape (N, M).
+    """
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(1, -1, 4)
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - intersection
+    return np.where(union > 0, intersection / np.where(union > 0, union, 1), 0.0)
+
+def sharpness(image):
+    """
+    Variance of the Laplacian, a cheap focus measure.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+class Track:
+    """
+    One plate followed across frames, with the OCR reads made on it.
+    """
+
+    def __init__(self, track_id, box, frame_idx):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float64)
+        self.first_frame = frame_idx
+        self.last_frame = frame_idx
+        self.hits = 1
+        self.reads = []
+        self.best_sharpness = 0.0
+        self.best_area = 0.0
+
+    def update(self, box, frame_idx):
+        self.box = np.asarray(box, dtype=np.float64)
+        self.last_frame = frame_idx
+        self.hits += 1
+
+    def needs_read(self, crop, gain=0.25, max_reads=5):
+        """
+        Read a track once, then again only when the crop is noticeably sharper or larger.
+        """
+        if crop.size == 0 or len(self.reads) >= max_reads:
+            return False
+        if not self.reads:
+            return True
+        area = crop.shape[0] * crop.shape[1]
+        return sharpness(crop) > self.best_sharpness * (1 + gain) or area > self.best_area * (1 + gain)
+
+    def add_read(self, text, crop, frame_idx):
+        area = crop.shape[0] * crop.shape[1]
+        self.best_sharpness = max(self.best_sharpness, sharpness(crop))
+        self.best_area = max(self.best_area, area)
+        self.reads.append({'text': text, 'frame': frame_idx, 'area': area})
+
+    def vote(self):
+        """
+        Consolidated text of the track: reads are weighted by crop area, since
+        larger crops are read more reliably. Returns the text and its vote share.
+        """
+        votes = defaultdict(float)
+        for read in self.reads:
+            if read['text']:
+                votes[read['text']] += read['area']
+        if not votes:
+            return '', 0.0
+        text = max(votes, key=votes.get)
+        return text, votes[text] / sum(votes.values())
+
+    def result(self):
+        text, share = self.vote()
+        return {
+            'track_id': self.track_id,
+            'text': text,
+            'vote_share': share,
+            'n_reads': len(self.reads),
+            'reads': [read['text'] for read in self.reads],
+            'first_frame': self.first_frame,
+            'last_frame': self.last_frame,
+            'hits': self.hits,
+            'box': [int(v) for v in self.box],
+        }
+
+class PlateTracker:
+    """
+    Link plate boxes across frames by IoU, falling back to centroid distance
+    (relative to the box diagonal) for fast motion between processed frames.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_distance=0.5, max_age=15, min_hits=2):
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks = []
+        self._next_id = 0
+
+    def _scores(self, boxes):
+        track_boxes = np.array([track.box for track in self.tracks]).reshape(-1, 4)
+        iou = pairwise_iou(track_boxes, boxes)
+        centers_t = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+        centers_d = (boxes[:, :2] + boxes[:, 2:]) / 2
+        diagonal = np.hypot(*(track_boxes[:, 2:] - track_boxes[:, :2]).T)
+        distance = np.linalg.norm(centers_t[:, None] - centers_d[None], axis=2) / np.maximum(diagonal, 1)[:, None]
+        # IoU matches always win over centroid matches
+        centroid_score = (1 - distance / self.max_distance) * self.iou_threshold
+        scores = np.where(iou >= self.iou_threshold, iou, np.where(distance <= self.max_distance, centroid_score, -1))
+        return scores
+
+    def update(self, boxes, frame_idx):
+        """
+        Assign detections of a frame to tracks. Returns one track per box.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        assigned = [None] * len(boxes)
+
+        if self.tracks and len(boxes):
+            scores = self._scores(boxes)
+            used_tracks, used_boxes = set(), set()
+            for flat in np.argsort(-scores, axis=None):
+                t, d = np.unravel_index(flat, scores.shape)
+                if scores[t, d] < 0:
+                    break
+                if t in used_tracks or d in used_boxes:
+                    continue
+                used_tracks.add(t)
+                used_boxes.add(d)
+                self.tracks[t].update(boxes[d], frame_idx)
+                assigned[d] = self.tracks[t]
+
+        for d, box in enumerate(boxes):
+            if assigned[d] is None:
+                track = Track(self._next_id, box, frame_idx)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[d] = track
+        return assigned
+
+    def expire(self, frame_idx):
+        """
+        Remove tracks not seen for more than max_age frames and return the confirmed ones.
+        """
+        finished = [track for track in self.tracks if frame_idx - track.last_frame > self.max_age]
+        self.tracks = [track for track in self.tracks if frame_idx - track.last_frame <= self.max_age]
+        return [track for track in finished if track.hits >= self.min_hits]
+
+    def flush(self):
+        """
+        End all tracks and return the confirmed ones.
+        """
+        finished, self.tracks = self.tracks, []
+        return [track for track in finished if track.hits >= self.min_hits]
@@ -6,6 +6,7 @@ import random
 def display_images_side_by_side(dir1, dir2, sample_size=5):
     """
     Display images from two directories side by side for comparison.
+    To review more than a few samples, render contact sheets with scripts/contact_sheet.py.
     """
     dir1_files = set(os.listdir(dir1))
     dir2_files = set(os.listdir(dir2))
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from src.evaluation import character_confusion, edit_distance, match_plates
+
+def _true_labels(rows):
+    return pd.DataFrame(rows, columns=['filename', 'true_lp_text', 'x_min', 'y_min', 'x_max', 'y_max'])
+
+def test_edit_distance():
+    distances = edit_distance(['1234ABC', '1234AB', '', 'XBC', '1234ABC'],
+                              ['1234ABC', '1234ABC', 'ABC', 'ABC', '9234ABD'])
+    assert distances.tolist() == [0, 1, 3, 1, 2]
+
+def test_edit_distance_in_chunks():
+    pred, true = ['AB', 'A', 'ABC', 'B'], ['AB', 'AB', 'A', 'C']
+    assert edit_distance(pred, true, chunk_size=3).tolist() == edit_distance(pred, true).tolist() == [0, 1, 2, 1]
+
+def test_character_confusion():
+    confusion = character_confusion(['1234ABD', '123'], ['1234ABC', '1234'])
+    assert confusion.loc['C', 'D'] == 1
+    # The missing 4 of the second plate is a deletion
+    assert confusion.loc['4', ''] == 1
+    assert confusion.loc['4', '4'] == 1
+    assert confusion.loc['A', 'A'] == 1
+    assert confusion.to_numpy().sum() == 11
+
+def test_character_confusion_insertion():
+    confusion = character_confusion(['AB'], ['A'])
+    assert confusion.loc['A', 'A'] == 1
+    assert confusion.loc['', 'B'] == 1
+
+def test_match_plates_by_box():
+    true_labels = _true_labels([['img.jpg', 'AAA', 0, 0, 10, 10], ['img.jpg', 'BBB', 100, 0, 110, 10]])
+    pred_labels = pd.DataFrame({
+        'filename': ['img_crop_0.jpg', 'img_crop_1.jpg', 'img_crop_2.jpg'],
+        'ocr_text': ['BBX', 'AAA', 'CCC'],
+        'x_min': [100, 0, 50], 'y_min': [0, 0, 0], 'x_max': [110, 10, 60], 'y_max': [10, 10, 10],
+    })
+    matches = match_plates(pred_labels, true_labels).set_index('filename')
+    # Boxes decide the pairing, not the texts
+    assert matches.loc['img_crop_0.jpg', 'true_lp_text'] == 'BBB'
+    assert matches.loc['img_crop_1.jpg', 'true_lp_text'] == 'AAA'
+    assert pd.isna(matches.loc['img_crop_2.jpg', 'true_id'])
+
+def test_match_plates_by_text_is_one_to_one():
+    true_labels = _true_labels([['img.jpg', 'AAA', 0, 0, 10, 10], ['img.jpg', 'BBB', 0, 0, 10, 10],
+                                ['other.jpg', 'CCC', 0, 0, 10, 10]])
+    pred_labels = pd.DataFrame({'filename': ['img_crop_0.jpg', 'img_crop_1.jpg'], 'ocr_text': ['AAB', 'AAA']})
+    matches = match_plates(pred_labels, true_labels)
+    pairs = dict(zip(matches['ocr_text'], matches['true_lp_text']))
+    assert pairs['AAA'] == 'AAA'
+    assert pairs['AAB'] == 'BBB'
+    # The plate of the other image has no prediction, but still gets a row
+    unmatched = matches[matches['pred_id'].isna()]
+    assert unmatched['true_lp_text'].tolist() == ['CCC']
+    assert len(matches) == 3
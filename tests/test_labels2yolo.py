@@ -0,0 +1,30 @@
+import os
+from scripts.labels2yolo import relocate_outputs
+
+def test_relocate_outputs_moves_files_to_new_split(tmp_path):
+    root = str(tmp_path)
+    outputs = [os.path.join('LP', 'images', 'train', 'a.jpg'), os.path.join('LP', 'labels', 'train', 'a.txt'),
+               os.path.join('OCR', 'images', 'train', 'a_1234ABC.jpg')]
+    for path in outputs:
+        os.makedirs(os.path.join(root, os.path.dirname(path)).replace('train', 'val'), exist_ok=True)
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(root, path), 'w') as f:
+            f.write(path)
+    entry = {
+        'inputs': {'split': 'train', 'json': 'x'},
+        'outputs': outputs,
+        'lp_record': {'image': 'images/train/a.jpg', 'labels': ['0 0.5 0.5 0.1 0.1']},
+        'ocr_records': [{'image': 'images/train/a_1234ABC.jpg', 'labels': []}],
+    }
+    inputs = {'split': 'val', 'json': 'x'}
+
+    moved = relocate_outputs(entry, inputs, root)
+
+    assert moved['inputs'] == inputs
+    assert moved['outputs'] == [path.replace('train', 'val') for path in outputs]
+    for old, new in zip(outputs, moved['outputs']):
+        assert not os.path.exists(os.path.join(root, old))
+        with open(os.path.join(root, new)) as f:
+            assert f.read() == old
+    assert moved['lp_record'] == {'image': 'images/val/a.jpg', 'labels': ['0 0.5 0.5 0.1 0.1']}
+    assert moved['ocr_records'] == [{'image': 'images/val/a_1234ABC.jpg', 'labels': []}]
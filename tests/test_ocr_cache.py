@@ -0,0 +1,49 @@
+import numpy as np
+from src.ocr_cache import OCRCache, cache_key
+
+def _image(value):
+    return np.full((16, 64, 3), value, np.uint8)
+
+def test_cache_key_depends_on_engine_and_settings():
+    image = _image(1)
+    assert cache_key(image, 'easyocr') == cache_key(image.copy(), 'easyocr')
+    assert cache_key(image, 'easyocr') != cache_key(image, 'fast_plate_ocr')
+    assert cache_key(image, 'easyocr', settings='scored') != cache_key(image, 'easyocr')
+    assert cache_key(image, 'easyocr') != cache_key(_image(2), 'easyocr')
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = OCRCache(max_items=2)
+    cache.put_many([(b'a', 'A'), (b'b', 'B')])
+    # Using a makes b the least recently used entry
+    assert cache.get_many([b'a']) == {b'a': 'A'}
+    cache.put_many([(b'c', 'C')])
+    assert cache.get_many([b'a', b'b', b'c']) == {b'a': 'A', b'c': 'C'}
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses'], stats['memory_items']) == (3, 1, 2)
+
+def test_hits_and_misses_are_counted_per_lookup():
+    cache = OCRCache()
+    cache.put_many([(b'a', 'A')])
+    cache.get_many([b'a', b'a', b'b', b'b'])
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses']) == (2, 2)
+    assert stats['hit_rate'] == 0.5
+
+def test_disk_tier_survives_reopening(tmp_path):
+    path = str(tmp_path / 'ocr.sqlite')
+    with OCRCache(path) as cache:
+        cache.put_many([(b'a', 'A')])
+    with OCRCache(path) as cache:
+        assert cache.get_many([b'a', b'a']) == {b'a': 'A'}
+        assert cache.stats()['disk_hits'] == 2
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    # Every row takes 1 + 7 + 48 bytes, so three rows fit and a fourth one triggers eviction
+    with OCRCache(str(tmp_path / 'ocr.sqlite'), max_items=1, max_bytes=3 * 56) as cache:
+        for key in [b'a', b'b', b'c']:
+            cache.put_many([(key, key.decode() * 7)])
+        assert cache.get_many([b'a']) == {b'a': 'aaaaaaa'}
+        cache.put_many([(b'd', 'ddddddd')])
+        # Trimmed to 90% of the budget: the two most recently used rows are kept
+        assert set(cache.get_many([b'a', b'b', b'c', b'd'])) == {b'a', b'd'}
+        assert cache.stats()['disk_bytes'] == 2 * 56
@@ -0,0 +1,31 @@
+import numpy as np
+from src.ocr_engines import characters_to_text
+
+NAMES = np.array(list('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+
+def _classes(text):
+    return np.array(['0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'.index(char) for char in text])
+
+def test_single_row_is_read_left_to_right():
+    boxes = np.array([[20, 0, 30, 20], [0, 0, 10, 20], [10, 0, 20, 20]], dtype=float)
+    text, score = characters_to_text(boxes, np.array([0.9, 0.8, 0.95]), _classes('CAB'), NAMES)
+    assert text == 'ABC'
+    assert score == 0.8
+
+def test_two_rows_are_read_top_row_first():
+    boxes = np.array([[0, 30, 10, 50], [0, 0, 10, 20], [10, 31, 20, 51], [10, 1, 20, 21]], dtype=float)
+    text, _ = characters_to_text(boxes, np.ones(4), _classes('1A2B'), NAMES)
+    assert text == 'AB12'
+
+def test_slanted_single_row_is_not_split():
+    boxes = np.array([[0, 0, 10, 20], [10, 3, 20, 23], [20, 6, 30, 26]], dtype=float)
+    text, _ = characters_to_text(boxes, np.ones(3), _classes('123'), NAMES)
+    assert text == '123'
+
+def test_overlapping_characters_are_merged():
+    boxes = np.array([[0, 0, 10, 20], [1, 0, 11, 20], [10, 0, 20, 20]], dtype=float)
+    text, _ = characters_to_text(boxes, np.array([0.9, 0.6, 0.9]), _classes('8B1'), NAMES)
+    assert text == '81'
+
+def test_no_characters():
+    assert characters_to_text(np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int), NAMES) == ('', 0.0)
@@ -0,0 +1,30 @@
+import numpy as np
+from src.refine import nms, tile_regions
+
+def test_nms_keeps_highest_score_of_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 0, 11, 10], [50, 50, 60, 60], [0, 1, 10, 11]])
+    scores = np.array([0.6, 0.9, 0.5, 0.7])
+    assert nms(boxes, scores, iou_threshold=0.5).tolist() == [1, 2]
+
+def test_nms_threshold():
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10]])
+    scores = np.array([0.9, 0.8])
+    # IoU of the two boxes is 1/3
+    assert nms(boxes, scores, iou_threshold=0.5).tolist() == [0, 1]
+    assert nms(boxes, scores, iou_threshold=0.3).tolist() == [0]
+
+def test_nms_empty():
+    assert nms(np.zeros((0, 4)), np.zeros(0)).tolist() == []
+
+def test_tile_regions_cover_image_with_overlap():
+    regions = tile_regions((100, 200), tiles=2, overlap=0.2)
+    assert len(regions) == 4
+    assert regions[0][:2] == (0, 0)
+    assert max(region[2] for region in regions) == 200
+    assert max(region[3] for region in regions) == 100
+    left, right = regions[0], regions[1]
+    # Neighbouring tiles overlap by 20% of a tile
+    assert abs((left[2] - right[0]) - 0.2 * 200 / 1.8) <= 1
+
+def test_single_tile_is_whole_image():
+    assert tile_regions((100, 200, 3), tiles=1) == [(0, 0, 200, 100)]
@@ -0,0 +1,31 @@
+import os
+from src.splits import create_split_manifest
+
+def _write_dataset(root, train, test):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, 'train.txt'), 'w') as f:
+        f.write(''.join(f'{name}\n' for name in train))
+    with open(os.path.join(root, 'test.txt'), 'w') as f:
+        f.write(''.join(f'{name}\n' for name in test))
+
+def test_split_manifest_is_seeded(tmp_path):
+    root = str(tmp_path / 'data')
+    _write_dataset(root, [f'{i:05d}' for i in range(50)], ['t1', 't0'])
+    manifest = create_split_manifest(root, val_fraction=0.2, seed=3)
+    splits = manifest['splits']
+    assert len(splits['val']) == 10
+    assert sorted(splits['train'] + splits['val']) == [f'{i:05d}' for i in range(50)]
+    assert not set(splits['train']) & set(splits['val'])
+    assert splits['test'] == ['t0', 't1']
+    assert (manifest['seed'], manifest['val_fraction']) == (3, 0.2)
+
+    assert create_split_manifest(root, val_fraction=0.2, seed=3) == manifest
+    assert create_split_manifest(root, val_fraction=0.2, seed=4)['splits']['val'] != splits['val']
+
+def test_split_manifest_with_val_names(tmp_path):
+    root = str(tmp_path / 'data')
+    # train.txt may list paths with extensions
+    _write_dataset(root, ['train/a.jpg', 'train/b.jpg', 'train/c.jpg'], ['test/d.jpg'])
+    manifest = create_split_manifest(root, val_names={'b'})
+    assert manifest['splits'] == {'train': ['a', 'c'], 'val': ['b'], 'test': ['d']}
+    assert manifest['seed'] is None and manifest['val_fraction'] is None
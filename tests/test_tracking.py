@@ -0,0 +1,43 @@
+import numpy as np
+from src.tracking import PlateTracker, Track
+
+def test_tracker_links_boxes_by_iou():
+    tracker = PlateTracker()
+    first = tracker.update([[0, 0, 100, 40], [300, 0, 400, 40]], 0)
+    second = tracker.update([[305, 2, 405, 42], [2, 1, 102, 41]], 1)
+    assert [track.track_id for track in first] == [0, 1]
+    assert [track.track_id for track in second] == [1, 0]
+    assert all(track.hits == 2 for track in second)
+
+def test_tracker_falls_back_to_centroid_distance():
+    tracker = PlateTracker(max_distance=1.0)
+    tracker.update([[0, 0, 100, 40]], 0)
+    # No overlap, but the centre moved less than the box diagonal
+    moved, = tracker.update([[102, 0, 202, 40]], 1)
+    assert moved.track_id == 0
+    far, = tracker.update([[500, 0, 600, 40]], 2)
+    assert far.track_id == 1
+
+def test_tracker_expire_and_flush_return_confirmed_tracks():
+    tracker = PlateTracker(max_age=2, min_hits=2)
+    tracker.update([[0, 0, 100, 40], [300, 0, 400, 40]], 0)
+    tracker.update([[0, 0, 100, 40]], 1)
+    assert tracker.expire(3) == []
+    # The one-frame track is dropped unconfirmed, the other one is still alive
+    assert [track.track_id for track in tracker.tracks] == [0]
+    confirmed = tracker.expire(4)
+    assert [track.track_id for track in confirmed] == [0]
+    assert tracker.tracks == []
+
+    tracker.update([[0, 0, 100, 40]], 5)
+    assert tracker.flush() == []
+
+def test_track_vote_weights_reads_by_area():
+    track = Track(0, [0, 0, 10, 10], 0)
+    small, large = np.zeros((10, 20, 3), np.uint8), np.zeros((30, 60, 3), np.uint8)
+    track.add_read('1234ABD', small, 0)
+    track.add_read('1234ABD', small, 1)
+    track.add_read('1234ABC', large, 2)
+    text, share = track.vote()
+    assert text == '1234ABC'
+    assert share == 1800 / 2200
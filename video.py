@@ -0,0 +1,61 @@
+import json
+import argparse
+from ultralytics import YOLO
+from src import tracing
+from src.image_processing import DESKEW_METHODS
+from src.stream import run_video
+from src.tracking import PlateTracker
+
+def main(source, engine, weights, frame_skip=1, raw=False, device=None, max_age=15, min_hits=2,
+         read_gain=0.25, max_reads=5, deskew_method='hough', output=None, trace=None):
+    model = YOLO(weights)
+    tracker = PlateTracker(max_age=max_age, min_hits=min_hits)
+
+    print(f"Reading plates from '{source}' using engine='{engine}' (every {frame_skip} frame(s))...")
+    reads = []
+    for result in run_video(model, source, engine=engine, frame_skip=frame_skip, processed=not raw,
+                            device=device, tracker=tracker, read_gain=read_gain, max_reads=max_reads,
+                            deskew_method=deskew_method):
+        print(f"Track {result['track_id']}: '{result['text']}' "
+              f"(frames {result['first_frame']}-{result['last_frame']}, "
+              f"{result['n_reads']} read(s), {result['vote_share']:.0%} of the vote)")
+        reads.append(result)
+    print(f"{len(reads)} vehicle(s) read.")
+
+    if output is not None:
+        with open(output, 'w') as f:
+            for result in reads:
+                f.write(json.dumps(result) + '\n')
+        print(f"Reads saved to {output}")
+
+    if trace is not None:
+        tracing.export(trace)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track and read plates in a video or frame sequence.")
+    parser.add_argument("--source", type=str, required=True,
+                        help="Video file, camera index or directory of frames.")
+    parser.add_argument("--engine", type=str, required=True, help="OCR engine to use (e.g., 'easyocr').")
+    parser.add_argument("--weights", type=str, default="runs/detect/train/weights/best.pt", help="YOLO weights for plate detection.")
+    parser.add_argument("--frame-skip", type=int, default=1, help="Run the detector on every N-th frame only.")
+    parser.add_argument("--device", type=str, default=None, help="Detector device (default: CUDA, then MPS, then CPU).")
+    parser.add_argument("--max-age", type=int, default=15,
+                        help="Frames a track survives without a detection before its read is emitted.")
+    parser.add_argument("--min-hits", type=int, default=2, help="Detections needed before a track is reported.")
+    parser.add_argument("--read-gain", type=float, default=0.25,
+                        help="Re-read a track when a crop is this much sharper or larger than the best so far.")
+    parser.add_argument("--max-reads", type=int, default=5, help="Maximum number of OCR reads per track.")
+    parser.add_argument("--deskew-method", type=str, default="hough", choices=list(DESKEW_METHODS),
+                        help="Skew angle estimator used before OCR.")
+    parser.add_argument("--raw", action="store_true", help="Run OCR on raw crops, skipping deskew and thresholding.")
+    parser.add_argument("--output", type=str, default=None, help="Save the consolidated reads as JSON lines.")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Record per-stage timings and save them as JSON (plus Prometheus .prom) to this path.")
+
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable()
+    main(source=args.source, engine=args.engine, weights=args.weights, frame_skip=args.frame_skip,
+         raw=args.raw, device=args.device, max_age=args.max_age, min_hits=args.min_hits,
+         read_gain=args.read_gain, max_reads=args.max_reads, deskew_method=args.deskew_method,
+         output=args.output, trace=args.trace)